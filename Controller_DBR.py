@@ -5,33 +5,986 @@ from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_3, ether
 from ryu.lib.packet import packet
 from ryu.lib.packet import ethernet, ipv4, arp
+from ryu.lib import hub
+from eventlet import tpool
 from shutil import copyfile
 # from sets import Set
 # import Queue as Q
 import pickle
 import sys, os, time, random, math, pickle
-import networkx as nx
 import itertools
+import functools
+import collections
 import random
 import re
 import json
 import csv
-from ryu.app.wsgi import ControllerBase, WSGIApplication, route
+import heapq
+import hashlib
+import socket
+import struct
+import numpy as np
+import topo_descriptor
+from ryu.app.wsgi import ControllerBase, WSGIApplication, route, websocket
 from copy import copy, deepcopy
 from webob import Response
 
 ARP = arp.arp.__name__
 IPV4 = ipv4.ipv4.__name__
 UINT32_MAX = 0xffffffff
+timer = getattr(time, 'perf_counter', time.time)  # monotonic high resolution clock where available
 
 bqoe_path_api_instance_name = 'bqoe_path_api_name_app'
 url = '/bqoepath/{method}'
 
 # Max number of hops in returned PATH from all_simple_paths
 PATH_SIZE = 13
+MULTIPATH_LEVEL = 3  # alternative paths kept per host pair by the reactive forwarding
 BW_THRESHOLD = 4500000.0
 DISTANCE_FIX = PATH_SIZE / BW_THRESHOLD
 BW_BITRATE = 2000000.0
+PATH_PRIORITY = 1024  # priority of the per src-dst path flows
+FLOW_IDLE_TIMEOUT = 60  # seconds without traffic before a path flow expires, 0 keeps it forever
+FLOW_HARD_TIMEOUT = 0  # seconds before a path flow expires regardless of traffic, 0 disables
+
+# Content providers a user can be served from
+CDN_HOSTS = ["cdn1", "cdn2", "cdn3", "ext1"]
+
+# Switch naming plan (prefix, role, first dpid, last dpid): switch s21 is known as m1, and so on
+SWITCH_ROLES = [
+    ('r', 'ran', 1, 20),
+    ('m', 'metro', 21, 25),
+    ('a', 'access', 26, 29),
+    ('c', 'core', 30, 33),
+    ('i', 'internet', 34, 34),
+]
+# Hosts with fixed addresses, users take 10.0.0.<number> and switches 10.0.0.<SWITCH_IP_BASE + dpid>;
+# larger generated topologies number users past 10.0.0.255 and switches from SWITCH_NET + dpid
+HOST_IPS = {
+    "src1": "10.0.0.249",
+    "src2": "10.0.0.250",
+    "cdn1": "10.0.0.251",
+    "cdn2": "10.0.0.252",
+    "cdn3": "10.0.0.253",
+    "ext1": "10.0.0.254",
+}
+SWITCH_IP_BASE = 200
+SWITCH_IP_LAST = 248  # last octet free below the fixed host addresses
+USER_NET = "10.0.0.0"
+SWITCH_NET = "10.128.0.0"
+# Topology descriptor (.json) parsed by parse_graph, or a Mininet 'net' dump (no link capacities)
+TOPOLOGY_FILE = topo_descriptor.DEFAULT_DESCRIPTOR
+SNAPSHOT_FILE = 'bqoepath.snapshot'  # controller state kept across restarts, None disables snapshots
+SNAPSHOT_INTERVAL = 5.0  # seconds between two saves of a changed state
+SNAPSHOT_VERSION = 4
+
+# Link weight policy {(node, node): weight}, nodes in host naming (r1, m1, a1, ...)
+# Rules are directional: a rule only matches a link stored with that orientation in
+# the graph, just as the original per-request policy did. Other links get DEFAULT_WEIGHT.
+WEIGHT_RULES = {
+    ("a2", "a3"): 1000,
+    ("c2", "c1"): 1000,
+    ("m5", "m1"): 1000,
+    ("a1", "a4"): 1000,
+    ("m3", "m2"): 1000,
+    ("m5", "m4"): 3,
+}
+DEFAULT_WEIGHT = 1
+
+# How deploy_any_path programs the switches: 'none' fires and forgets, 'barrier' waits for
+# a barrier reply from every switch of the path, 'bundle' also commits each switch batch
+# atomically as an OpenFlow 1.3 (ONF extension) bundle before the barrier
+FLOW_INSTALL_MODE = 'barrier'
+BARRIER_TIMEOUT = 2.0  # seconds to wait for the switches to confirm a path
+# Protect every hop of a path with an OpenFlow fast-failover group whose backup bucket
+# leads to a local detour, so a link failure is routed around by the switch itself
+FAST_FAILOVER = True
+LINK_DOWN_PENALTY = 1e9  # weight added to a link whose port went down, routes this long are unusable
+
+TELEMETRY_INTERVAL = 1.0  # seconds between two port/flow stats polls of every switch
+TELEMETRY_HISTORY = 10  # samples kept per link direction
+CONGESTION_AWARE_ROUTING = False  # penalize links without room for one more BW_BITRATE video below BW_THRESHOLD
+CONGESTION_PENALTY = 1000  # weight added to a congested link
+
+ADMISSION_CONTROL = True  # refuse videos whose path has no link with room for BW_BITRATE
+ADMISSION_UTILIZATION = 0.9  # fraction of a link capacity that may be reserved for videos
+# Capacity (bps) of the links the topology does not shape: host links without a profile, every link of a 'net' dump.
+# The others get the bw of their link profile in the descriptor, as Topo_DBR.py shapes them
+DEFAULT_LINK_CAPACITY = 200000000.0
+
+# Bucket bounds (seconds) of the latency histograms exported by GET /bqoepath/metrics
+METRICS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0)
+METRICS_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+HISTOGRAM_SUB_BUCKETS = 32  # linear buckets per power of two, values are kept within 1/32 of their real size
+
+EVENT_RING_SIZE = 4096  # last events kept for GET /bqoepath/events and for new subscribers
+EVENT_SUBSCRIBER_QUEUE = 1024  # events a subscriber may lag behind before it is dropped
+
+PATH_WORKERS = 4  # OS threads computing paths outside the Ryu event loop
+PATH_QUEUE_SIZE = 256  # computations allowed to wait for a worker before requests are refused
+
+
+class PathPoolFull(Exception):
+    """
+    Raised when the path computation queue is full
+    """
+    pass
+
+
+class LatencyHistogram(object):
+    """
+    Log-linear latency histogram, in the spirit of HdrHistogram
+
+    Each power of two is split into HISTOGRAM_SUB_BUCKETS linear buckets, so a
+    sample is recorded with a bounded relative error by a frexp and a list
+    increment, whatever its magnitude (from about 1us to 2 minutes).
+    """
+    MIN_EXP = -20
+    MAX_EXP = 7
+
+    def __init__(self, sub_buckets=HISTOGRAM_SUB_BUCKETS):
+        self.sub_buckets = sub_buckets
+        self.counts = [0] * ((self.MAX_EXP - self.MIN_EXP + 1) * sub_buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        exps = np.repeat(np.arange(self.MIN_EXP, self.MAX_EXP + 1), sub_buckets)
+        subs = np.tile(np.arange(1, sub_buckets + 1), self.MAX_EXP - self.MIN_EXP + 1)
+        self.uppers = (0.5 + subs / (2.0 * sub_buckets)) * np.power(2.0, exps)  # upper bound of every bucket
+
+    def record(self, value):
+        mantissa, exp = math.frexp(value)
+        if value <= 0 or exp < self.MIN_EXP:
+            index = 0
+        elif exp > self.MAX_EXP:
+            index = len(self.counts) - 1
+        else:
+            index = (exp - self.MIN_EXP) * self.sub_buckets + int((mantissa - 0.5) * 2 * self.sub_buckets)
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def cumulative(self, bounds):
+        """
+        Samples at or below each bound, as the le buckets of a Prometheus histogram
+        """
+        slot = np.searchsorted(np.asarray(bounds), self.uppers)
+        per_bound = np.bincount(slot, weights=self.counts, minlength=len(bounds) + 1)
+        return np.cumsum(per_bound)[:len(bounds)].astype(np.int64).tolist()
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding quantile q, 0 when empty
+        """
+        if not self.count:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.counts), q * self.count))
+        return float(min(self.uppers[min(index, len(self.uppers) - 1)], self.max))
+
+
+class StageTimer(object):
+    """
+    Context manager recording the time spent in its block into a Metrics stage
+    """
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = timer()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record(timer() - self.start)
+        return False
+
+
+class Metrics(object):
+    """
+    Latency histograms per stage and labelled counters, rendered in the Prometheus text format
+    """
+
+    HELP = {
+        'bqoepath_stage_seconds': 'Time spent in each stage of the controller hot paths',
+        'bqoepath_request_seconds': 'Time spent serving each REST endpoint',
+        'bqoepath_requests_total': 'REST requests served, by endpoint and status',
+        'bqoepath_flowmods_total': 'FlowMods sent, by datapath',
+        'bqoepath_barrier_timeouts_total': 'Flow batches not confirmed within BARRIER_TIMEOUT, by datapath',
+    }
+
+    def __init__(self, buckets=METRICS_BUCKETS, quantiles=METRICS_QUANTILES):
+        self.buckets = buckets
+        self.quantiles = quantiles
+        self.histograms = {}  # {(name, labels): LatencyHistogram}
+        self.counters = {}  # {(name, labels): value}
+
+    def histogram(self, name, labels=()):
+        histogram = self.histograms.get((name, labels))
+        if histogram is None:
+            histogram = self.histograms[(name, labels)] = LatencyHistogram()
+        return histogram
+
+    def time(self, stage):
+        """
+        Times a block: with metrics.time('deploy'): ...
+        """
+        return StageTimer(self.histogram('bqoepath_stage_seconds', (('stage', stage),)))
+
+    def observe(self, name, labels, seconds):
+        self.histogram(name, labels).record(seconds)
+
+    def inc(self, name, labels=(), value=1):
+        self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    @staticmethod
+    def format_labels(labels):
+        return "{%s}" % ",".join('%s="%s"' % label for label in labels) if labels else ""
+
+    def exposition(self, gauges=()):
+        """
+        Text exposition of every metric
+
+        Parameters
+        ----------
+        gauges : list
+            [(name, help, value), ...] point in time values added to the output
+
+        Returns
+        -------
+        str
+        """
+        lines = []
+        for name in sorted(set(name for name, labels in self.histograms)):
+            lines.append("# HELP %s %s" % (name, self.HELP.get(name, name)))
+            lines.append("# TYPE %s histogram" % name)
+            for (metric, labels), histogram in sorted(self.histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(self.buckets, histogram.cumulative(self.buckets)):
+                    lines.append("%s_bucket%s %d" % (name, self.format_labels(labels + (('le', repr(bound)),)), count))
+                lines.append("%s_bucket%s %d" % (name, self.format_labels(labels + (('le', '+Inf'),)), histogram.count))
+                lines.append("%s_sum%s %r" % (name, self.format_labels(labels), histogram.sum))
+                lines.append("%s_count%s %d" % (name, self.format_labels(labels), histogram.count))
+
+            quantile_name = name.replace('_seconds', '_quantile_seconds')
+            lines.append("# HELP %s %s, quantiles of the full resolution histogram" % (quantile_name,
+                                                                                      self.HELP.get(name, name)))
+            lines.append("# TYPE %s gauge" % quantile_name)
+            for (metric, labels), histogram in sorted(self.histograms.items()):
+                if metric != name:
+                    continue
+                for q in self.quantiles:
+                    lines.append("%s%s %r" % (quantile_name, self.format_labels(labels + (('quantile', repr(q)),)),
+                                              histogram.quantile(q)))
+
+        for name in sorted(set(name for name, labels in self.counters)):
+            lines.append("# HELP %s %s" % (name, self.HELP.get(name, name)))
+            lines.append("# TYPE %s counter" % name)
+            for (metric, labels), value in sorted(self.counters.items()):
+                if metric == name:
+                    lines.append("%s%s %d" % (name, self.format_labels(labels), value))
+
+        for name, help_text, value in gauges:
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s gauge" % name)
+            lines.append("%s %r" % (name, value))
+        return "\n".join(lines) + "\n"
+
+
+def timed_endpoint(handler):
+    """
+    Counts and times the calls of a BQoEPathController REST handler, by endpoint and status
+    """
+    endpoint = handler.__name__
+
+    @functools.wraps(handler)
+    def _timed(self, req, **kwargs):
+        start = timer()
+        response = handler(self, req, **kwargs)
+        metrics = self.bqoe_path_spp.metrics
+        metrics.observe('bqoepath_request_seconds', (('endpoint', endpoint),), timer() - start)
+        metrics.inc('bqoepath_requests_total', (('endpoint', endpoint), ('status', str(response.status_code))))
+        return response
+    return _timed
+
+
+class EventBus(object):
+    """
+    Structured controller events, kept in a bounded ring and pushed to subscribers
+
+    Every event is a dict with a sequence number, a timestamp and a type
+    ('admission', 'denial', 'release', 'flowmod', 'flow_removed', 'weights' or
+    'telemetry'). A subscriber that lets its queue fill up is dropped instead of
+    slowing down the publisher: its queue is emptied and it receives None.
+    """
+
+    def __init__(self, size=EVENT_RING_SIZE, queue_size=EVENT_SUBSCRIBER_QUEUE):
+        self.ring = collections.deque(maxlen=size)
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.seq = itertools.count(1)
+        self.dropped = 0  # subscribers dropped for being too slow
+
+    def publish(self, kind, **fields):
+        fields.update(seq=next(self.seq), time=time.time(), type=kind)
+        self.ring.append(fields)
+        for queue in list(self.subscribers):
+            if queue.full():
+                self.drop(queue)
+            else:
+                queue.put_nowait(fields)
+
+    def subscribe(self, since=None):
+        """
+        New subscriber queue, primed with the kept events newer than seq since (all of them if None)
+        """
+        queue = hub.Queue(self.queue_size)
+        for event in self.recent(since)[-self.queue_size:]:
+            queue.put_nowait(event)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def drop(self, queue):
+        self.subscribers.discard(queue)
+        self.dropped += 1
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def recent(self, since=None):
+        """
+        Kept events newer than seq since, oldest first
+        """
+        if since is None:
+            return list(self.ring)
+        return [event for event in self.ring if event['seq'] > since]
+
+
+class PathWorkerPool(object):
+    """
+    Runs path computations on OS threads so the Ryu event loop keeps serving switches
+
+    The caller green thread sleeps until its result is ready, every other green
+    thread (OpenFlow events, other REST requests) keeps running. Computations must
+    not change controller state, results are applied by the caller back on the
+    controller thread. That includes the weight cache of CompactGraph: callers take
+    graph.weights_list() and pass it in as the weights of the computation.
+    """
+
+    def __init__(self, workers=PATH_WORKERS, queue_size=PATH_QUEUE_SIZE):
+        tpool.set_num_threads(workers)
+        self.slots = hub.BoundedSemaphore(workers)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_time = 0.0  # seconds spent by computations waiting for a worker
+        self.run_time = 0.0  # seconds spent computing
+
+    def execute(self, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on a worker and returns its result
+
+        Raises
+        ------
+        PathPoolFull
+            if PATH_QUEUE_SIZE computations are already waiting for a worker
+        """
+        if self.queued >= self.queue_size:
+            self.rejected += 1
+            raise PathPoolFull()
+
+        queued_at = time.time()
+        self.queued += 1
+        self.slots.acquire()
+        self.queued -= 1
+        self.running += 1
+        started_at = time.time()
+        self.wait_time += started_at - queued_at
+        try:
+            return tpool.execute(fn, *args, **kwargs)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.run_time += time.time() - started_at
+            self.slots.release()
+
+    def stats(self):
+        """
+        Backpressure counters of the pool
+        """
+        return dict(workers=self.workers, queue_size=self.queue_size, queued=self.queued, running=self.running,
+                    completed=self.completed, rejected=self.rejected, wait_time=self.wait_time,
+                    run_time=self.run_time)
+
+
+class CompactGraph(object):
+    """
+    Integer indexed, array backed topology used by routing
+
+    Nodes are numbered in order of first appearance in the edge list. Adjacency
+    is kept in CSR form (indptr/indices), every adjacency slot pointing to its
+    undirected edge. Edge weights and the output port of every slot live in
+    NumPy arrays. Edges are oriented from the lower to the higher node id, which
+    is the orientation WEIGHT_RULES are matched against.
+    """
+
+    def __init__(self, elist, edges_ports):
+        """
+        Parameters
+        ----------
+        elist : list
+            [(u, v), ...] undirected links by node name
+        edges_ports : dict
+            {node: {neighbor: port}} output port of node towards neighbor
+        """
+        self.names = []
+        self.index = {}
+        ends = []
+        known = set()
+        for u, v in elist:
+            for node in (u, v):
+                if node not in self.index:
+                    self.index[node] = len(self.names)
+                    self.names.append(node)
+            a, b = sorted((self.index[u], self.index[v]))
+            if (a, b) not in known:
+                known.add((a, b))
+                ends.append((a, b))
+
+        self.n = len(self.names)
+        self.m = len(ends)
+        self.ends = np.array(ends, dtype=np.int32).reshape(self.m, 2)
+        self.weights = np.ones(self.m, dtype=np.float64)
+
+        degree = np.bincount(self.ends.ravel(), minlength=self.n)
+        self.indptr = np.zeros(self.n + 1, dtype=np.int32)
+        np.cumsum(degree, out=self.indptr[1:])
+        self.indices = np.empty(2 * self.m, dtype=np.int32)
+        self.slot_edge = np.empty(2 * self.m, dtype=np.int32)
+        self.ports = np.full(2 * self.m, -1, dtype=np.int32)
+        self.slot_of = {}  # {(u id, v id): adjacency slot of v in the row of u}
+        fill = self.indptr[:-1].copy()
+        for e, (a, b) in enumerate(ends):
+            for u, v in ((a, b), (b, a)):
+                slot = fill[u]
+                fill[u] += 1
+                self.indices[slot] = v
+                self.slot_edge[slot] = e
+                self.ports[slot] = edges_ports.get(self.names[u], {}).get(self.names[v], -1)
+                self.slot_of[(u, v)] = slot
+
+        # the structure never changes, python lists make the search loops much faster
+        self._indptr = self.indptr.tolist()
+        self._indices = self.indices.tolist()
+        self._slot_edge = self.slot_edge.tolist()
+        self._weights = None
+
+    def nodes(self):
+        return list(self.names)
+
+    def neighbors(self, node):
+        u = self.index[node]
+        return [self.names[v] for v in self._indices[self._indptr[u]:self._indptr[u + 1]]]
+
+    def edges(self):
+        """
+        Iterates (u, v, edge id) by node name
+        """
+        names = self.names
+        for e, (a, b) in enumerate(self.ends.tolist()):
+            yield names[a], names[b], e
+
+    def edge_id(self, u, v):
+        """
+        Id of the link between nodes u and v, None if there is none
+        """
+        slot = self.slot_of.get((self.index.get(u), self.index.get(v)))
+        return None if slot is None else self._slot_edge[slot]
+
+    def port(self, u, v):
+        """
+        Output port of switch u towards its neighbor v
+        """
+        return int(self.ports[self.slot_of[(self.index[u], self.index[v])]])
+
+    def weight(self, u, v):
+        return self.weights_list()[self.edge_id(u, v)]
+
+    def set_weights(self, edge_ids, weight):
+        self.weights[edge_ids] = weight
+        self._weights = None
+
+    def weights_list(self):
+        """
+        Edge weights as a python list, rebuilt only after weights change
+
+        Only called on the controller thread. set_weights drops the list instead of
+        changing it, so a path worker holding it keeps a consistent snapshot.
+        """
+        weights = self._weights
+        if weights is None:
+            weights = self._weights = self.weights.tolist()
+        return weights
+
+    def dijkstra(self, source, targets, ignored_nodes=(), ignored_edges=(), weights=None, nearest=False):
+        """
+        Single-source Dijkstra over node ids that stops as soon as every target (or the nearest one) is settled
+
+        Parameters
+        ----------
+        source : int
+            node id where the search starts
+        targets : iterable
+            node ids to be settled
+        ignored_nodes : set
+            node ids the search must not go through
+        ignored_edges : set
+            edge ids the search must not use
+        weights : list
+            positive weight per edge id, defaults to the graph weights
+        nearest : bool
+            stop at the first target settled
+
+        Returns
+        -------
+        dist, prev : dict, dict
+            distances and predecessors of every settled node id
+        """
+        indptr = self._indptr
+        indices = self._indices
+        slot_edge = self._slot_edge
+        w = self.weights_list() if weights is None else weights
+        pending = set(targets)
+        dist = {}
+        prev = {source: None}
+        seen = {source: 0}
+        counter = itertools.count()
+        heap = [(0, next(counter), source)]
+
+        while heap and pending:
+            d, _, u = heapq.heappop(heap)
+            if u in dist:
+                continue
+            dist[u] = d
+            if u in pending:
+                pending.discard(u)
+                if nearest:
+                    break
+            for slot in range(indptr[u], indptr[u + 1]):
+                v = indices[slot]
+                if v in dist or v in ignored_nodes:
+                    continue
+                e = slot_edge[slot]
+                if e in ignored_edges:
+                    continue
+                vd = d + w[e]
+                if v not in seen or vd < seen[v]:
+                    seen[v] = vd
+                    prev[v] = u
+                    heapq.heappush(heap, (vd, next(counter), v))
+
+        return dist, prev
+
+    @staticmethod
+    def walk_back(prev, source, target):
+        """
+        Walks the predecessors map back from target, returning [target, ..., source]
+        """
+        sp = [target]
+        pv = prev[target]
+        while pv is not None:
+            sp.append(pv)
+            pv = prev[pv]
+        return sp
+
+    def bridges(self, ignored_edges=()):
+        """
+        Edge ids of the links whose loss disconnects the graph (iterative Tarjan)
+
+        Parameters
+        ----------
+        ignored_edges : set
+            edge ids considered missing, e.g. dead links
+        """
+        indptr = self._indptr
+        indices = self._indices
+        slot_edge = self._slot_edge
+        disc = [-1] * self.n
+        low = [0] * self.n
+        counter = itertools.count()
+        found = set()
+        for root in range(self.n):
+            if disc[root] != -1:
+                continue
+            disc[root] = low[root] = next(counter)
+            stack = [(root, -1, indptr[root])]  # (node, edge from its parent, next adjacency slot)
+            while stack:
+                u, parent_edge, slot = stack[-1]
+                if slot < indptr[u + 1]:
+                    stack[-1] = (u, parent_edge, slot + 1)
+                    e = slot_edge[slot]
+                    if e == parent_edge or e in ignored_edges:
+                        continue
+                    v = indices[slot]
+                    if disc[v] == -1:
+                        disc[v] = low[v] = next(counter)
+                        stack.append((v, e, indptr[v]))
+                    elif disc[v] < low[u]:
+                        low[u] = disc[v]
+                    continue
+                stack.pop()
+                if stack:
+                    parent = stack[-1][0]
+                    if low[u] < low[parent]:
+                        low[parent] = low[u]
+                    if low[u] > disc[parent]:
+                        found.add(parent_edge)
+        return found
+
+    def path_length(self, path, weights=None):
+        """
+        Sum of the weights along a path of node ids
+        """
+        w = self.weights_list() if weights is None else weights
+        slot_of = self.slot_of
+        slot_edge = self._slot_edge
+        return sum(w[slot_edge[slot_of[(path[i], path[i + 1])]]] for i in range(len(path) - 1))
+
+    def shortest_simple_paths(self, source, target, weights=None):
+        """
+        Lazily yields the loopless paths of node ids from source to target by increasing length (Yen)
+
+        Each new path costs one Dijkstra per node of the previous one, so asking
+        only for the k paths needed is cheap, unlike enumerating all simple paths.
+        """
+        w = self.weights_list() if weights is None else weights
+        dist, prev = self.dijkstra(source, [target], weights=w)
+        if target not in dist:
+            return
+        found = [self.walk_back(prev, source, target)[::-1]]
+        yield found[0]
+
+        slot_of = self.slot_of
+        slot_edge = self._slot_edge
+        seen = set([tuple(found[0])])
+        candidates = []
+        counter = itertools.count()
+        while True:
+            last = found[-1]
+            for i in range(len(last) - 1):
+                spur = last[i]
+                root = last[:i + 1]
+                ignored_edges = set(slot_edge[slot_of[(p[i], p[i + 1])]] for p in found if p[:i + 1] == root)
+                ignored_nodes = set(root[:-1])
+                dist, prev = self.dijkstra(spur, [target], ignored_nodes, ignored_edges, w)
+                if target not in dist:
+                    continue
+                path = root[:-1] + self.walk_back(prev, spur, target)[::-1]
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (self.path_length(path, w), next(counter), path))
+
+            if not candidates:
+                return
+            found.append(heapq.heappop(candidates)[2])
+            yield found[-1]
+
+    def to_networkx(self):
+        """
+        Exports the topology as a networkx Graph with weight and port attributes (needs networkx)
+        """
+        import networkx as nx
+
+        graph = nx.Graph()
+        graph.add_nodes_from(self.names)
+        weights = self.weights_list()
+        for u, v, e in self.edges():
+            graph.add_edge(u, v, weight=weights[e], ports={u: self.port(u, v), v: self.port(v, u)})
+        return graph
+
+
+class NodeRegistry(object):
+    """
+    Naming and addressing of every node, resolved once from the topology
+
+    A switch is known by its bridge name (s21), its name in host naming (m1, also
+    the name of its aux host), its dpid (21) and an address (10.0.0.221). Hosts
+    are known by name and address. Every lookup is a dict access, whole paths
+    included: they are translated node by node, since at their length (about 8
+    nodes) NumPy fancy indexing over per-node-id arrays costs more than the
+    dict lookups it would replace.
+    """
+
+    def __init__(self, names):
+        """
+        Parameters
+        ----------
+        names : list
+            node names of the topology
+        """
+        self.human = {}  # {'s21': 'm1', 'm1': 'm1', 'u001': 'u001'}
+        self.switch = {}  # {'m1': 's21', 's21': 's21', 'u001': 'u001'}
+        self.dpid = {}  # {'s21': 21, 'm1': 21}
+        self.name_by_dpid = {}  # {21: 's21'}
+        self.ip = {}  # {'u001': '10.0.0.1', 's21': '10.0.0.221', 'm1': '10.0.0.221'}
+        self.name_by_ip = {}  # {'10.0.0.1': 'u001', '10.0.0.221': 'm1'}
+        self.role = {}  # {'s21': 'metro', 'm1': 'metro', 'u001': 'user', 'cdn1': 'cdn'}
+        for name in names:
+            self.add(name)
+
+    @staticmethod
+    def ip_to_int(ip):
+        return 0 if ip is None else struct.unpack('!I', socket.inet_aton(ip))[0]
+
+    @staticmethod
+    def int_to_ip(value):
+        return socket.inet_ntoa(struct.pack('!I', value))
+
+    def add(self, name):
+        """
+        Registers a node (and, for switches, all its aliases) from its name
+        """
+        if name in self.role:
+            return
+
+        prefix, rest = name[0], name[1:]
+        if prefix == 's' and rest.isdigit():
+            self.add_switch(int(rest))
+            return
+        for switch_prefix, role, first, last in SWITCH_ROLES:
+            if prefix == switch_prefix and rest.isdigit() and 1 <= int(rest) <= last - first + 1:
+                self.add_switch(first + int(rest) - 1)
+                return
+
+        self.human[name] = name
+        self.switch[name] = name
+        if name in HOST_IPS:
+            ip = HOST_IPS[name]
+            self.role[name] = 'source' if name.startswith('src') else 'cdn'
+        elif prefix in ('u', 'h') and rest.isdigit():  # users, and the 'h' + last octet packet-in naming
+            ip = self.int_to_ip(self.ip_to_int(USER_NET) + int(rest))  # removing leading zeros
+            self.role[name] = 'user'
+        else:
+            ip = None
+            self.role[name] = 'host'
+        if ip is not None:
+            self.ip[name] = ip
+            self.name_by_ip.setdefault(ip, name)
+
+    def add_switch(self, dpid):
+        bridge = "s%d" % dpid
+        human = bridge
+        role = 'switch'
+        for prefix, switch_role, first, last in SWITCH_ROLES:
+            if first <= dpid <= last:
+                human = "%s%d" % (prefix, dpid - first + 1)
+                role = switch_role
+                break
+
+        if SWITCH_IP_BASE + dpid <= SWITCH_IP_LAST:
+            ip = "10.0.0.%d" % (SWITCH_IP_BASE + dpid)
+        else:
+            ip = self.int_to_ip(self.ip_to_int(SWITCH_NET) + dpid)
+        self.name_by_dpid[dpid] = bridge
+        self.name_by_ip[ip] = human
+        for name in (bridge, human):
+            self.human[name] = human
+            self.switch[name] = bridge
+            self.dpid[name] = dpid
+            self.ip[name] = ip
+            self.role[name] = role
+
+    def to_switch(self, name):
+        if name not in self.role:
+            self.add(name)
+        return self.switch[name]
+
+    def to_human(self, name):
+        if name not in self.role:
+            self.add(name)
+        return self.human[name]
+
+    def ip_of(self, name):
+        if name not in self.role:
+            self.add(name)
+        return self.ip.get(name)
+
+    def humanize(self, path):
+        """
+        Translates a whole path of node names to host naming
+        """
+        human = self.human
+        return [human[name] if name in human else self.to_human(name) for name in path]
+
+
+class LinkTelemetry(object):
+    """
+    Per-link load and loss measured from OpenFlow port stats
+
+    Samples live in fixed size NumPy ring buffers, one row per adjacency slot of
+    the CompactGraph, i.e. per link direction: the slot of switch u towards v is
+    fed by the tx counters of the port of u that faces v.
+    """
+
+    def __init__(self, graph, registry, history=TELEMETRY_HISTORY):
+        self.graph = graph
+        self.history = history
+        slots = 2 * graph.m
+        self.tx_bps = np.full((slots, history), np.nan)
+        self.loss = np.full((slots, history), np.nan)
+        self.samples = np.zeros(slots, dtype=np.int64)  # samples ever written per slot
+        self.counters = {}  # {slot: (seconds, tx_bytes, tx_packets, tx_dropped + tx_errors)} last port stats
+        self.flow_counts = {}  # {dpid: path flows seen in the last flow stats}
+        self.pending_flows = {}  # {dpid: path flows counted so far in a multipart reply}
+
+        self.slot_of_port = {}  # {(dpid, port_no): slot}
+        for u in range(graph.n):
+            dpid = registry.dpid.get(graph.names[u])
+            if dpid is None:
+                continue
+            for slot in range(graph.indptr[u], graph.indptr[u + 1]):
+                if graph.ports[slot] >= 0:
+                    self.slot_of_port[(dpid, int(graph.ports[slot]))] = slot
+
+    def add_port_stats(self, dpid, stats):
+        """
+        Turns the counters of an OFPPortStatsReply body into rate and loss samples
+        """
+        for stat in stats:
+            slot = self.slot_of_port.get((dpid, stat.port_no))
+            if slot is None:
+                continue
+            now = stat.duration_sec + stat.duration_nsec / 1e9
+            current = (now, stat.tx_bytes, stat.tx_packets, stat.tx_dropped + stat.tx_errors)
+            last = self.counters.get(slot)
+            self.counters[slot] = current
+            if last is None or now <= last[0]:
+                continue
+
+            sent = current[2] - last[2]
+            lost = current[3] - last[3]
+            pos = self.samples[slot] % self.history
+            self.tx_bps[slot, pos] = 8.0 * (current[1] - last[1]) / (now - last[0])
+            self.loss[slot, pos] = float(lost) / (sent + lost) if sent + lost > 0 else 0.0
+            self.samples[slot] += 1
+
+    def add_flow_stats(self, dpid, stats, more):
+        """
+        Counts the path flows of an OFPFlowStatsReply, which may span several messages
+        """
+        count = self.pending_flows.pop(dpid, 0) + sum(1 for stat in stats if stat.priority == PATH_PRIORITY)
+        if more:
+            self.pending_flows[dpid] = count
+        else:
+            self.flow_counts[dpid] = count
+
+    def _per_edge(self, rings):
+        with np.errstate(invalid='ignore'):
+            filled = np.minimum(self.samples, self.history)
+            per_slot = np.where(filled > 0, np.nansum(rings, axis=1) / np.maximum(filled, 1), 0.0)
+        per_edge = np.zeros(self.graph.m)
+        np.maximum.at(per_edge, self.graph.slot_edge, per_slot)
+        return per_edge
+
+    def edge_bps(self):
+        """
+        Mean load of every link over the kept samples, busiest direction, indexed by edge id
+        """
+        return self._per_edge(self.tx_bps)
+
+    def edge_loss(self):
+        """
+        Mean loss ratio of every link over the kept samples, worst direction, indexed by edge id
+        """
+        return self._per_edge(self.loss)
+
+    def congested(self, threshold=BW_THRESHOLD, bitrate=BW_BITRATE):
+        """
+        Mask of the links that cannot take one more video of bitrate without going over threshold
+        """
+        return self.edge_bps() + bitrate > threshold
+
+
+class AdmissionControl(object):
+    """
+    Bandwidth reservations of the ongoing videos over the links of a CompactGraph
+
+    Every admitted video reserves its bitrate on each link of its path; a path is
+    admissible only while every link stays within its limit, ADMISSION_UTILIZATION
+    of its capacity.
+    """
+
+    def __init__(self, graph, capacities=None, default=DEFAULT_LINK_CAPACITY, utilization=ADMISSION_UTILIZATION):
+        """
+        Parameters
+        ----------
+        capacities : dict
+            {(u, v): bps} capacity of the links by node name, in any orientation, default for the others
+        """
+        self.graph = graph
+        self.capacity = np.full(graph.m, default)
+        for (u, v), capacity in (capacities or {}).items():
+            e = graph.edge_id(u, v)
+            if e is not None:
+                self.capacity[e] = capacity
+        self.limit = self.capacity * utilization
+        self.reserved = np.zeros(graph.m)
+        self.sessions = {}  # {session: (edge ids, bitrate)}
+        self.session_ids = itertools.count(1)
+
+    def path_edges(self, path):
+        """
+        Edge ids of the links along a path of node names
+        """
+        edge_id = self.graph.edge_id
+        return np.array([edge_id(path[i], path[i + 1]) for i in range(len(path) - 1)], dtype=np.int64)
+
+    def fits(self, edges, bitrate=BW_BITRATE):
+        return bool((self.reserved[edges] + bitrate <= self.limit[edges]).all())
+
+    def saturated(self, bitrate=BW_BITRATE):
+        """
+        Edge ids of the links without room for one more reservation of bitrate
+        """
+        return set(np.nonzero(self.reserved + bitrate > self.limit)[0].tolist())
+
+    def residual(self):
+        """
+        Capacity still available for reservations, per edge id
+        """
+        return self.limit - self.reserved
+
+    def reserve(self, edges, bitrate=BW_BITRATE, session=None):
+        """
+        Reserves bitrate on the given edges, returns the session id holding it (a new one unless given)
+        """
+        if session is None:
+            session = next(self.session_ids)
+        np.add.at(self.reserved, edges, bitrate)
+        self.sessions[session] = (edges, bitrate)
+        return session
+
+    def release(self, session):
+        """
+        Gives back the bandwidth of a session, returns False if it was not reserved
+        """
+        reservation = self.sessions.pop(session, None)
+        if reservation is None:
+            return False
+        edges, bitrate = reservation
+        np.subtract.at(self.reserved, edges, bitrate)
+        np.maximum(self.reserved, 0.0, out=self.reserved)
+        return True
 
 
 class BQoEPathApi(app_manager.RyuApp):
@@ -52,23 +1005,69 @@ class BQoEPathApi(app_manager.RyuApp):
         wsgi = kwargs['wsgi']
         wsgi.register(BQoEPathController, {bqoe_path_api_instance_name: self})
         self.nodes = []
-        self.ongoingVideos = {}
+        self.ongoingVideos = {}  # {session: {'src': 'u001', 'dst': 'cdn1', 'path': [...], 'bitrate': bps, 'start': t}}
         self.numNodes = 0
         self.rtt = []
-        self.bw = []
-        self.numFlowsRound = []
-        self.bwMirror = []
-        self.loss = []
         self.links = []
         self.dpset = kwargs['dpset']
         self.dp_dict = {}  # dictionary of datapaths
         self.elist = []  # edges list to the graph
         self.edges_ports = {}  # dictionary of ports {src: {dst: port, dst2: port2}, ...}
-        self.parse_graph()  # call the function that populates the priors variables
-        self.graph = nx.MultiGraph()  # create the graph
-        self.graph.add_edges_from(self.elist)  # add edges to the graph
+        self.link_capacities = {}  # {(u, v): bps} shaped capacity of the links of the topology descriptor
+        snapshot = self.read_snapshot()
+        if snapshot is None:
+            self.parse_graph()  # call the function that populates the priors variables
+        else:
+            self.elist, self.edges_ports = snapshot['elist'], snapshot['edges_ports']
+            self.link_capacities = snapshot['link_capacities']
+        self.graph = CompactGraph(self.elist, self.edges_ports)  # create the graph
+        self.registry = NodeRegistry(self.graph.names)  # names, dpids and addresses of every node
+        self.telemetry = LinkTelemetry(self.graph, self.registry)  # link load and loss from port stats
+        self.base_weights = np.ones(self.graph.m)  # weights set by the policy and REST deltas, per edge id
+        self.weight_penalty = np.zeros(self.graph.m)  # added on top of base_weights, e.g. for congestion
+        self.link_down = np.zeros(self.graph.m, dtype=bool)  # links whose port status reported them down
+        # bandwidth reserved by ongoing videos
+        self.admission = AdmissionControl(self.graph, self.link_capacities)
+        self.events = EventBus()  # admission, flow and telemetry events for dashboards
+        self.metrics = Metrics()  # stage latencies and counters for GET /bqoepath/metrics
         self.possible_paths = {}  # dictionary {src-id : [[path1],[path2]]}
+        self.mac_to_port = {}
+        self.paths_defineds = {}  # {'ipv4_src-ipv4_dst': [path1, path2, ...]} pairs served by packet-in
+        self.k_paths = {}  # {(src, dst): ([k shortest paths], exhausted)}
+        self.routes_version = 0  # bumped on every invalidation, results computed before it are not cached
+        self.path_pool = PathWorkerPool()
         self.current_path = None
+        self.access_switch = {}  # single-homed host -> switch it hangs from {'u001': 's1', ...}
+        self.route_table = {}  # {(access switch, frozenset(cdns)): {cdn: (distance, [cdn, ..., switch])}}
+        self.route_deps = {}  # {frozenset((u, v)): set of route_table keys whose paths use that link}
+        self.edge_index = {}  # {(p1, p2): [edge id, ...]} graph edges by their host naming
+        self.port_edges = {}  # {(dpid, port_no): edge id} link behind each switch port
+        self.detour_cache = {}  # {tuple(path): {hop: [node ids of the detour]}} see path_detours
+        self.bridge_edges = None  # edge ids of the live links without any alternative, see path_detours
+        self.group_ids = {}  # {dpid: {(ipv4_src, ipv4_dst): group id}} fast-failover groups of the path flows
+        self.next_group_ids = {}  # {dpid: itertools.count} group ids handed out on each switch
+        self.barriers = {}  # {(dpid, xid): hub.Event} barrier requests waiting for a reply
+        self.bundle_ids = itertools.count(1)
+        # {dpid: {(ipv4_src, ipv4_dst): out_port or (out_port, backup_port)}} path flows present on each switch
+        self.installed_flows = {}
+        self.pair_switches = {}  # {(ipv4_src, ipv4_dst): set(dpid)} switches holding a flow for the pair
+        # {(ipv4_src, ipv4_dst): set(dpid)} switches only on a detour of the pair, whose flow never idles out
+        self.standby_switches = {}
+        # {dpid: {xid: ([stats], complete)}} dumps being received from (re)connected switches: their flow
+        # table, and their group table when groups of theirs are indexed
+        self.reconciling = {}
+        self.reconciled = set()  # dpids whose path flows were checked against their flow table
+        self.snapshot_loaded = snapshot is not None
+        self.snapshot_dirty = False  # state changed since the last snapshot
+        self.map_access_switches()
+        self.index_edges()
+        if snapshot is None:
+            self.load_weights(WEIGHT_RULES)
+            self.build_route_table(CDN_HOSTS)
+        else:
+            self.restore_snapshot(snapshot)
+        self.telemetry_thread = hub.spawn(self.telemetry_loop)
+        self.snapshot_thread = hub.spawn(self.snapshot_loop)
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
@@ -97,6 +1096,22 @@ class BQoEPathApi(app_manager.RyuApp):
         # print('************')
 
         self.dp_dict[dpid] = datapath  # saving datapath on a dictionary
+        # the switch may still hold path flows (the controller restarted, not the switch): they
+        # are kept in the index until its flow table dump says otherwise, see reconcile_flows
+        self.installed_flows.setdefault(dpid, {})
+        self.reconciled.discard(dpid)
+        dumps = [parser.OFPFlowStatsRequest(datapath, 0, ofproto.OFPTT_ALL, ofproto.OFPP_ANY, ofproto.OFPG_ANY, 0, 0,
+                                            parser.OFPMatch())]
+        if not self.group_ids.get(dpid):
+            # no group of the switch is indexed (cold start, or none in the snapshot): any group it
+            # holds is left from an earlier run and its id would be handed out again. Deleting a
+            # group deletes the flows forwarding to it too, so the dump below no longer shows them.
+            datapath.send_msg(parser.OFPGroupMod(datapath, ofproto.OFPGC_DELETE, ofproto.OFPGT_FF, ofproto.OFPG_ALL))
+            self.next_group_ids.pop(dpid, None)
+        else:
+            # its groups are dumped too, reconcile_flows deletes those the index does not keep
+            dumps.append(parser.OFPGroupDescStatsRequest(datapath, 0))
+        self.request_dumps(datapath, dumps)
 
         # install table-miss flow entry 
         # drop unknown packets
@@ -125,15 +1140,237 @@ class BQoEPathApi(app_manager.RyuApp):
             actions to be made after a match
         """
 
+        datapath.send_msg(self.build_flow(datapath, priority, match, actions))
+
+    @staticmethod
+    def build_flow(datapath, priority, match, actions, cookie=0, idle_timeout=0, hard_timeout=0, flags=0):
+        """
+        Builds the FlowMod that add_flow would send, so it can be batched
+        """
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
 
         inst = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS,
                                              actions)]
 
-        mod = parser.OFPFlowMod(datapath=datapath, priority=priority,
-                                match=match, instructions=inst)
-        datapath.send_msg(mod)
+        return parser.OFPFlowMod(datapath=datapath, cookie=cookie, priority=priority,
+                                 idle_timeout=idle_timeout, hard_timeout=hard_timeout, flags=flags,
+                                 match=match, instructions=inst)
+
+    def build_path_flow(self, datapath, ip_src, ip_dst, out_port, idle_timeout=FLOW_IDLE_TIMEOUT):
+        """
+        Builds the FlowMod of one hop of a src-dst path
+
+        The flow carries the pair cookie and the configured timeouts, and asks the
+        switch for a FlowRemoved so flow_removed_handler keeps the index in sync.
+        out_port may also be a ready made action, e.g. towards a fast-failover group.
+        """
+        parser = datapath.ofproto_parser
+        match = parser.OFPMatch(eth_type=0x0800, ipv4_src=ip_src, ipv4_dst=ip_dst)
+        actions = [out_port if isinstance(out_port, parser.OFPAction) else parser.OFPActionOutput(out_port)]
+        return self.build_flow(datapath, PATH_PRIORITY, match, actions, cookie=self.pair_cookie(ip_src, ip_dst),
+                               idle_timeout=idle_timeout, hard_timeout=FLOW_HARD_TIMEOUT,
+                               flags=datapath.ofproto.OFPFF_SEND_FLOW_REM)
+
+    def build_hop(self, datapath, pair, out, previous, standby=False):
+        """
+        Messages turning the flow of pair on a switch from previous into out
+
+        Parameters
+        ----------
+        pair : tuple
+            (ipv4_src, ipv4_dst)
+        out : int or tuple
+            output port, or (output port, backup port) for a fast-failover group
+        previous : int or tuple
+            what the switch holds for the pair, None if nothing
+        standby : bool
+            the switch is only on a detour: its flow sees no traffic until a link fails, so it
+            must not idle out
+
+        Returns
+        -------
+        list
+            group mods first, so the flow never points to a missing group
+        """
+        ip_src, ip_dst = pair
+        if not isinstance(out, tuple):
+            msgs = [self.build_path_flow(datapath, ip_src, ip_dst, out, 0 if standby else FLOW_IDLE_TIMEOUT)]
+            if isinstance(previous, tuple):
+                msgs.append(self.build_group_delete(datapath, self.group_ids[datapath.id].pop(pair)))
+            return msgs
+
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        groups = self.group_ids.setdefault(datapath.id, {})
+        group_id = groups.get(pair)
+        if group_id is None:
+            group_id = groups[pair] = next(self.next_group_ids.setdefault(datapath.id, itertools.count(1)))
+        command = ofproto.OFPGC_MODIFY if isinstance(previous, tuple) else ofproto.OFPGC_ADD
+        buckets = [parser.OFPBucket(watch_port=port, watch_group=ofproto.OFPG_ANY,
+                                    actions=[parser.OFPActionOutput(port)]) for port in out]
+        group = parser.OFPGroupMod(datapath, command, ofproto.OFPGT_FF, group_id, buckets)
+        return [group, self.build_path_flow(datapath, ip_src, ip_dst, parser.OFPActionGroup(group_id))]
+
+    @staticmethod
+    def build_group_delete(datapath, group_id):
+        ofproto = datapath.ofproto
+        return datapath.ofproto_parser.OFPGroupMod(datapath, ofproto.OFPGC_DELETE, ofproto.OFPGT_FF, group_id)
+
+    @staticmethod
+    def pair_cookie(ip_src, ip_dst):
+        """
+        64 bit cookie of a src-dst pair: source address on the upper half, destination on the lower
+        """
+        src = struct.unpack('!I', socket.inet_aton(ip_src))[0]
+        dst = struct.unpack('!I', socket.inet_aton(ip_dst))[0]
+        return (src << 32) | dst
+
+    @set_ev_cls(ofp_event.EventOFPFlowRemoved, MAIN_DISPATCHER)
+    def flow_removed_handler(self, ev):
+        """
+            Forgets path flows the switch expired or deleted
+        """
+        msg = ev.msg
+        if msg.priority != PATH_PRIORITY:
+            return
+
+        dpid = msg.datapath.id
+        pair = (msg.match.get('ipv4_src'), msg.match.get('ipv4_dst'))
+        if isinstance(self.installed_flows.get(dpid, {}).pop(pair, None), tuple):
+            msg.datapath.send_msg(self.build_group_delete(msg.datapath, self.group_ids[dpid].pop(pair)))
+        self.snapshot_dirty = True
+        self.events.publish('flow_removed', dpid=dpid, ipv4_src=pair[0], ipv4_dst=pair[1], reason=msg.reason,
+                            packets=msg.packet_count, bytes=msg.byte_count)
+        self.forget_pair_switch(pair, dpid)
+
+    def forget_pair_switch(self, pair, dpid):
+        """
+        Drops dpid from the switches holding pair; once only detour switches are left the path is
+        gone, and their flows, which never idle out, are deleted too
+        """
+        switches = self.pair_switches.get(pair)
+        if switches is None:
+            return
+        switches.discard(dpid)
+        standby = self.standby_switches.get(pair, set())
+        standby.discard(dpid)
+        if switches and switches <= standby:
+            for other in switches:
+                self.installed_flows.get(other, {}).pop(pair, None)
+                datapath = self.dp_dict.get(other)
+                if datapath is not None:
+                    for msg in self.build_pair_delete(datapath, pair):
+                        datapath.send_msg(msg)
+            switches.clear()
+        if not switches:
+            del self.pair_switches[pair]
+            self.standby_switches.pop(pair, None)
+
+    def send_batches(self, batches, mode=None):
+        """
+        Sends FlowMods (and GroupMods) grouped per switch and waits for the switches to confirm them
+
+        Every switch gets its whole batch before any barrier is awaited, so the
+        switches process their batches in parallel.
+
+        Parameters
+        ----------
+        batches : dict
+            {dpid: [msg, ...]}
+        mode : str
+            'none', 'barrier' or 'bundle', defaults to FLOW_INSTALL_MODE
+
+        Returns
+        -------
+        bool
+            True if every switch confirmed its batch within BARRIER_TIMEOUT
+        """
+        mode = mode or FLOW_INSTALL_MODE
+        pending = []
+        for dpid, msgs in batches.items():
+            datapath = self.dp_dict[dpid]
+            parser = datapath.ofproto_parser
+            ofproto = datapath.ofproto
+            self.metrics.inc('bqoepath_flowmods_total', (('dpid', str(dpid)),), len(msgs))
+
+            if mode == 'bundle':
+                # only the FlowMods are bundled: groups are added before the flows pointing
+                # to them and deleted once no flow does
+                groups = [msg for msg in msgs if isinstance(msg, parser.OFPGroupMod)]
+                for msg in groups:
+                    if msg.command != ofproto.OFPGC_DELETE:
+                        datapath.send_msg(msg)
+                bundle_id = next(self.bundle_ids)
+                flags = ofproto.ONF_BF_ATOMIC | ofproto.ONF_BF_ORDERED
+                datapath.send_msg(parser.ONFBundleCtrlMsg(datapath, bundle_id, ofproto.ONF_BCT_OPEN_REQUEST,
+                                                          flags, []))
+                for msg in msgs:
+                    if not isinstance(msg, parser.OFPGroupMod):
+                        datapath.send_msg(parser.ONFBundleAddMsg(datapath, bundle_id, flags, msg, []))
+                datapath.send_msg(parser.ONFBundleCtrlMsg(datapath, bundle_id, ofproto.ONF_BCT_COMMIT_REQUEST,
+                                                          flags, []))
+                for msg in groups:
+                    if msg.command == ofproto.OFPGC_DELETE:
+                        datapath.send_msg(msg)
+            else:
+                for msg in msgs:
+                    datapath.send_msg(msg)
+
+            if mode != 'none':
+                barrier = parser.OFPBarrierRequest(datapath)
+                datapath.set_xid(barrier)
+                event = hub.Event()
+                self.barriers[(dpid, barrier.xid)] = event
+                datapath.send_msg(barrier)
+                pending.append(((dpid, barrier.xid), event))
+
+        installed = True
+        deadline = time.time() + BARRIER_TIMEOUT
+        for key, event in pending:
+            if not event.wait(max(0, deadline - time.time())):
+                self.logger.warning("switch s%s did not confirm its flows in %ss", key[0], BARRIER_TIMEOUT)
+                self.metrics.inc('bqoepath_barrier_timeouts_total', (('dpid', str(key[0])),))
+                installed = False
+            self.barriers.pop(key, None)
+        return installed
+
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, MAIN_DISPATCHER)
+    def barrier_reply_handler(self, ev):
+        """
+            Wakes up whoever is waiting for this barrier (see send_batches)
+        """
+        event = self.barriers.pop((ev.msg.datapath.id, ev.msg.xid), None)
+        if event is not None:
+            event.set()
+
+    @set_ev_cls(ofp_event.EventOFPErrorMsg, [CONFIG_DISPATCHER, MAIN_DISPATCHER])
+    def error_msg_handler(self, ev):
+        """
+            Forgets the flow of a pair whose GroupMod the switch rejected
+
+            The flow would forward to whatever group holds the id on the switch, so it
+            is deleted along with that group, and the next request for the pair installs
+            the hop again under a fresh group id.
+        """
+        msg = ev.msg
+        datapath = msg.datapath
+        ofproto = datapath.ofproto
+        if msg.type != ofproto.OFPET_GROUP_MOD_FAILED or len(msg.data) < ofproto.OFP_GROUP_MOD_SIZE:
+            return
+
+        group_id = struct.unpack_from(ofproto.OFP_GROUP_MOD_PACK_STR, msg.data, ofproto.OFP_HEADER_SIZE)[2]
+        dpid = datapath.id
+        pair = next((pair for pair, group in self.group_ids.get(dpid, {}).items() if group == group_id), None)
+        self.logger.warning("s%s rejected group %d (error code %d), dropping the flow of %s", dpid, group_id,
+                            msg.code, pair)
+        if pair is None:
+            return
+        self.installed_flows.get(dpid, {}).pop(pair, None)
+        for delete in self.build_pair_delete(datapath, pair):
+            datapath.send_msg(delete)
+        self.snapshot_dirty = True
+        self.forget_pair_switch(pair, dpid)
 
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
     def _packet_in_handler(self, ev):
@@ -143,16 +1380,14 @@ class BQoEPathApi(app_manager.RyuApp):
 
         msg = ev.msg
         datapath = msg.datapath
-        ofproto = datapath.ofproto
-        parser = datapath.ofproto_parser
         in_port = msg.match['in_port']
 
-        reg = re.compile(".([0-9]+)$")
-
         pkt = packet.Packet(msg.data)
         eth = pkt.get_protocols(ethernet.ethernet)[0]
         ip = pkt.get_protocol(ipv4.ipv4)
         p_arp = pkt.get_protocol(arp.arp)
+        if ip is None and p_arp is None:
+            return
 
         header_list = dict((p.protocol_name, p)
                            for p in pkt.protocols if type(p) != str)
@@ -171,35 +1406,47 @@ class BQoEPathApi(app_manager.RyuApp):
         else:
             self.logger.info("packet in s%s, src: %s, dst: %s, in_port: %s", datapath_id, ipv4_src, ipv4_dst, in_port)
 
+        # path computation may take a while, leave the event loop free meanwhile
+        hub.spawn(self.serve_packet_in, msg, header_list, src, ipv4_src, ipv4_dst)
+
+    def serve_packet_in(self, msg, header_list, src, ipv4_src, ipv4_dst):
+        """
+        Computes and installs the paths for a packet-in, then forwards the packet
+        """
+        datapath = msg.datapath
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        in_port = msg.match['in_port']
+        datapath_id = datapath.id
+        reg = re.compile(".([0-9]+)$")
+
         # ipv4 addresses
-        src_id = reg.search(ipv4_src).group(1)
         dst_id = reg.search(ipv4_dst).group(1)
-        src_host = "h" + src_id
-        dst_host = "h" + dst_id
+        src_host = self.registry.name_by_ip.get(ipv4_src)
+        dst_host = self.registry.name_by_ip.get(ipv4_dst)
         # defining switch paths to install rules
 
-        paths = list(nx.all_simple_paths(self.graph, src_host, dst_host, PATH_SIZE))
+        try:
+            with self.metrics.time('k_shortest_paths'):
+                paths = self.k_shortest_paths(src_host, dst_host, MULTIPATH_LEVEL) if src_host and dst_host else []
+        except PathPoolFull:
+            self.logger.warning("path workers busy, dropping packet in s%s to %s", datapath_id, ipv4_dst)
+            return
         if len(paths) > 0:
-            # check to see if already exists a path (rules in switches) between such hosts
+            # a pair served before reaches the controller again once its flows idled out, so the path is
+            # always deployed; deploy_any_path leaves the hops still installed alone
             key = ipv4_src + '-' + ipv4_dst
-            if key in self.paths_defineds.keys():
-                self.logger.info("already created this path")
+            if key in self.paths_defineds:
+                self.logger.info("path flows missing, installing this path again")
             else:
                 self.logger.info("we must create this path")
-                self.paths_defineds[key] = paths
+            self.paths_defineds[key] = paths
+            self.logger.info("Using %s paths: ", len(paths))
+            for path in paths:
+                self.logger.info("\t%s", path)
 
-                # first we need to check how many paths we have at all minimum cutoff is PATH_SIZE
-                path_num = len(paths)
-                if path_num > MULTIPATH_LEVEL:  # if num of paths is bigger than MULTIPATH_LEVEL slices the array
-                    paths = paths[:MULTIPATH_LEVEL]
-                self.logger.info("we have: %s path(s)", path_num)
-                self.logger.info("Using %s paths: ", len(paths))
-                for path in paths:
-                    self.logger.info("\t%s", path)
-                group_dict = self.get_group_routers(paths)
-
-                # print (mod_group_entry(paths))
-                self.create_route(paths, group_dict)
+            # forward right away, the packet-out below follows the flows on the same connection
+            self.deploy_any_path(paths[0], mode='none')
 
             # create mac host to send arp reply
             mac_host_dst = "00:04:00:00:00:0" + dst_id if len(dst_id) == 1 else "00:04:00:00:00:" + dst_id
@@ -209,8 +1456,12 @@ class BQoEPathApi(app_manager.RyuApp):
                 self.send_arp(datapath, arp.ARP_REPLY, mac_host_dst, src,
                               ipv4_dst, ipv4_src, src, ofproto.OFPP_CONTROLLER, in_port)
             else:  # if it is not ARP outputs the message to the corresponding port
-                # print self.edges_ports
-                out_port = self.edges_ports[paths[0][1]][paths[0][2]]
+                switch = "s%s" % datapath_id
+                path = paths[0]
+                if switch not in path[1:-1]:
+                    self.logger.info("s%s is not on the path to %s", datapath_id, ipv4_dst)
+                    return
+                out_port = self.graph.port(switch, path[path.index(switch) + 1])
                 actions = [parser.OFPActionOutput(out_port)]
                 data = None
                 if msg.buffer_id == ofproto.OFP_NO_BUFFER:
@@ -221,122 +1472,214 @@ class BQoEPathApi(app_manager.RyuApp):
         else:
             self.logger.info("Destination unreacheable")
 
-    @staticmethod
-    def switch_from_host(path):
-        ran_lower_bound = 1
-        ran_upper_bound = 20
-        metro_lower_bound = 21
-        metro_upper_bound = 25
-        access_lower_bound = 26
-        access_upper_bound = 29
-        core_lower_bound = 30
-        core_upper_bound = 33
-        internet_lower_bound = 34
-        internet_upper_bound = 34
-
-        path_first = path[0]
-        path_rest = path[1:]
-        switch_index = 0
-
-        if path_first == 'r':
-            switch_index = int(path_rest) + ran_lower_bound - 1
-        elif path_first == 'm':
-            switch_index = int(path_rest) + metro_lower_bound - 1
-        elif path_first == 'a':
-            switch_index = int(path_rest) + access_lower_bound - 1
-        elif path_first == 'c' and path[1] != 'd':
-            switch_index = int(path_rest) + core_lower_bound - 1
-        elif path_first == 'i':
-            switch_index = int(path_rest) + internet_lower_bound - 1
-
-        if switch_index > 0:
-            return 's' + str(switch_index)
-        else:
-            return path
+    def switch_from_host(self, path):
+        """
+        Bridge name of a switch given in host naming ('m1' -> 's21'), other names are returned as is
+        """
+        return self.registry.to_switch(path)
 
     def host_from_switch(self, path):
-        ran_lower_bound = 1
-        ran_upper_bound = 20
-        metro_lower_bound = 21
-        metro_upper_bound = 25
-        access_lower_bound = 26
-        access_upper_bound = 29
-        core_lower_bound = 30
-        core_upper_bound = 33
-        internet_lower_bound = 34
-        internet_upper_bound = 34
-
-        path_first = path[0]
-        path_rest = path[1:]
-        switch_index = 0
-
-        if path_first == 's':
-            switch_index = int(path_rest)
-            if ran_lower_bound <= switch_index <= ran_upper_bound:
-                r_index = switch_index - ran_lower_bound + 1
-                return "r{0}".format(str(r_index))
-            elif metro_lower_bound <= switch_index <= metro_upper_bound:
-                m_index = switch_index - metro_lower_bound + 1
-                return "m{0}".format(str(m_index))
-            elif access_lower_bound <= switch_index <= access_upper_bound:
-                a_index = switch_index - access_lower_bound + 1
-                return "a{0}".format(str(a_index))
-            elif core_lower_bound <= switch_index <= core_upper_bound:
-                c_index = switch_index - core_lower_bound + 1
-                return "c{0}".format(str(c_index))
-            elif internet_lower_bound <= switch_index <= internet_upper_bound:
-                i_index = switch_index - internet_lower_bound + 1
-                return "i{0}".format(str(i_index))
-            else:
-                return path
-        else:
-            return path
+        """
+        Host naming of a switch ('s21' -> 'm1'), other names are returned as is
+        """
+        return self.registry.to_human(path)
 
     def ip_from_host(self, host):
-        if host == "src1":
-            return "10.0.0.249"
-        elif host == "src2":
-            return "10.0.0.250"
-        elif host == "cdn1":
-            return "10.0.0.251"
-        elif host == "cdn2":
-            return "10.0.0.252"
-        elif host == "cdn3":
-            return "10.0.0.253"
-        elif host == "ext1":
-            return "10.0.0.254"
+        """
+        Address of a host or switch, None if the name has none
+        """
+        return self.registry.ip_of(host)
+
+    def deploy_any_path(self, path, mode=None):
+        """
+        Installs both directions of path, one batch per switch
+
+        Hops whose flow is already installed with the same output are skipped, and
+        switches that held a flow for the pair but are no longer on the path get it
+        removed.
+
+        Returns
+        -------
+        bool
+            True once every switch of the path confirmed its flows
+        """
+        return self.deploy_paths([path], mode)
+
+    def deploy_paths(self, paths, mode=None):
+        """
+        Installs both directions of several paths, merged into one batch per switch
+
+        Parameters
+        ----------
+        paths : list
+            paths in host naming, [[cdn, ..., user], ...]
+        mode : str
+            'none', 'barrier' or 'bundle', defaults to FLOW_INSTALL_MODE
+
+        Returns
+        -------
+        bool
+            True once every switch of every path confirmed its flows
+        """
+        batches = {}
+        updates = []  # [(dpid, (ipv4_src, ipv4_dst), out_port or None for removal)]
+        with self.metrics.time('deploy_plan'):
+            for path in paths:
+                self.plan_path(path, batches, updates)
+                self.plan_path(path[::-1], batches, updates)
+
+        if paths:
+            self.current_path = paths[-1]
+        with self.metrics.time('deploy_send'):
+            installed = self.send_batches(batches, mode)
+        switches = {}
+        for dpid, pair, out_port in updates:
+            flows = self.installed_flows.setdefault(dpid, {})
+            added, removed = switches.get(dpid, (0, 0))
+            if out_port is None:
+                switches[dpid] = (added, removed + 1)
+            else:
+                switches[dpid] = (added + 1, removed)
+            if out_port is None or not installed:
+                # unconfirmed flows are forgotten so the next request installs them again
+                flows.pop(pair, None)
+            else:
+                flows[pair] = out_port
+        self.snapshot_dirty = True
+        if switches:
+            self.events.publish('flowmod', paths=paths, installed=installed, mode=mode or FLOW_INSTALL_MODE,
+                                switches=dict(("s%s" % dpid, dict(added=added, removed=removed))
+                                              for dpid, (added, removed) in switches.items()))
+        return installed
+
+    def plan_path(self, path, batches, updates):
+        """
+        Adds the FlowMods of one direction of path to the per switch batches
+
+        Parameters
+        ----------
+        path : list
+            path in host naming, the flows match traffic from path[0] to path[-1]
+        batches : dict
+            {dpid: [msg, ...]} extended in place
+        updates : list
+            [(dpid, (ipv4_src, ipv4_dst), out_port or None for removal)] extended in place
+        """
+        ip_src = self.ip_from_host(str(path[0]))  # to get the id
+        ip_dst = self.ip_from_host(str(path[-1]))
+        pair = (ip_src, ip_dst)
+        names = self.graph.names
+        detours = self.path_detours(path) if FAST_FAILOVER else {}
+        hops = {}  # {dpid: output port, or (output port, backup port)}
+        for i in range(1, len(path) - 1):
+            # installing rule for the i switch
+            dpid = self.registry.dpid[path[i]]
+            out_port = self.graph.port("s%s" % dpid, self.switch_from_host(path[i + 1]))
+            detour = detours.get(i)
+            hops[dpid] = out_port if detour is None else (out_port, self.graph.port(names[detour[0]],
+                                                                                     names[detour[1]]))
+        standby = set()
+        for i, detour in sorted(detours.items()):
+            # the detour switches only carry the pair once a backup bucket sends it their way, and
+            # path_detours never makes two detours disagree on a switch
+            for j in range(1, len(detour) - 1):
+                dpid = self.registry.dpid.get(names[detour[j]])
+                if dpid is not None and dpid not in hops:
+                    hops[dpid] = self.graph.port(names[detour[j]], names[detour[j + 1]])
+                    standby.add(dpid)
+
+        was_standby = self.standby_switches.get(pair, set())
+        for dpid, out in hops.items():
+            installed = self.installed_flows.get(dpid, {}).get(pair)
+            if installed == out and (dpid in standby) == (dpid in was_standby):
+                continue
+            datapath = self.dp_dict[dpid]
+            self.logger.debug("installing rule on s%s %s %s: %s", dpid, ip_src, ip_dst, out)
+            batches.setdefault(dpid, []).extend(self.build_hop(datapath, pair, out, installed, dpid in standby))
+            updates.append((dpid, pair, out))
+
+        for dpid in self.pair_switches.get(pair, set()) - set(hops):
+            datapath = self.dp_dict[dpid]
+            self.logger.debug("removing stale rule on s%s %s %s", dpid, ip_src, ip_dst)
+            batches.setdefault(dpid, []).extend(self.build_pair_delete(datapath, pair))
+            updates.append((dpid, pair, None))
+        self.pair_switches[pair] = set(hops)
+        if standby:
+            self.standby_switches[pair] = standby
         else:
-            first = host[0]
-            if first == 'u':
-                ip_final = host.split("u")[1]
-                return "10.0.0.{0}".format(str(int(ip_final)))  # removing leading zeros
-            elif first == 'r' or first == 'm' or first == 'a' or first == 'c' or first == 'i' or first == 's':
-                sn = self.switch_from_host(host)
-                restsn = sn[1:]
-                ipfinal = 200 + int(restsn)
-                return "10.0.0." + str(ipfinal)
-
-    def deploy_any_path(self, path):
-        paths = [path, path[::-1]]
-        for path in paths:
-            for i in range(1, len(path) - 1):
-                # installing rule for the i switch
-                sn = self.switch_from_host(path[i])
-                dpid = int(sn[1:])
-                _next = self.switch_from_host(path[i + 1])
-                datapath = self.dp_dict[dpid]
-                parser = datapath.ofproto_parser
-                ofproto = datapath.ofproto
+            self.standby_switches.pop(pair, None)
 
-                out_port = self.edges_ports["s%s" % dpid][_next]
-                actions = [parser.OFPActionOutput(out_port)]
-                self.logger.info("installing rule from %s to %s %s %s", path[i], path[i + 1], str(path[0][1:]),
-                                 str(path[-1][1:]))
-                ip_src = self.ip_from_host(str(path[0]))  # to get the id
-                ip_dst = self.ip_from_host(str(path[-1]))
-                match = parser.OFPMatch(eth_type=0x0800, ipv4_src=ip_src, ipv4_dst=ip_dst)
-                self.add_flow(datapath, 1024, match, actions)
-        self.current_path = path
+    def build_pair_delete(self, datapath, pair):
+        """
+        Messages removing the flow of pair from a switch, and its fast-failover group if it has one
+        """
+        ip_src, ip_dst = pair
+        match = datapath.ofproto_parser.OFPMatch(eth_type=0x0800, ipv4_src=ip_src, ipv4_dst=ip_dst)
+        msgs = [self.build_flow_delete(datapath, PATH_PRIORITY, match)]
+        group_id = self.group_ids.get(datapath.id, {}).pop(pair, None)
+        if group_id is not None:
+            msgs.append(self.build_group_delete(datapath, group_id))
+        return msgs
+
+    def path_detours(self, path):
+        """
+        Local detour of every hop of path, the backup buckets of its fast-failover groups
+
+        The detour of hop i leaves path[i] without using the link to path[i + 1] nor
+        going back through the switches before it, and ends on the first node of
+        the rest of the path it reaches, whose flow then carries the traffic on.
+        A switch holds a single flow for the pair, so the detours of a path never
+        cross each other: a detour may end on a switch of an earlier detour that
+        joins the path after path[i], and follows it from there, but never goes
+        through one joining the path at path[i] or before, which would send the
+        traffic back to the failed link. The last switch has none, single-homed
+        hosts have a single link, and a link whose loss splits the network (a RAN
+        uplink) has no detour to search for.
+
+        Returns
+        -------
+        dict
+            {i: [node ids from path[i] to where the detour joins the path again]}
+        """
+        key = tuple(path)
+        detours = self.detour_cache.get(key)
+        if detours is not None:
+            return detours
+
+        graph = self.graph
+        ids = [graph.index[self.switch_from_host(node)] for node in path]
+        down = set(np.nonzero(self.link_down)[0].tolist())
+        if self.bridge_edges is None:
+            self.bridge_edges = graph.bridges(down)
+        detours = {}
+        claimed = {}  # {node id of a detour: index of the path node where that detour joins the path}
+        for i in range(1, len(ids) - 2):
+            primary = graph.edge_id(graph.names[ids[i]], graph.names[ids[i + 1]])
+            if primary in self.bridge_edges:
+                continue
+            joins = dict((node, k) for k, node in enumerate(ids) if k > i)
+            joins.update((node, join) for node, join in claimed.items() if join > i)
+            ignored = set(ids[:i])
+            ignored.update(node for node, join in claimed.items() if join <= i)
+            dist, prev = graph.dijkstra(ids[i], joins, ignored_nodes=ignored, ignored_edges=down | {primary},
+                                        nearest=True)
+            reached = [node for node in joins if node in dist]
+            if reached:
+                detour = detours[i] = graph.walk_back(prev, ids[i], reached[0])[::-1]
+                for node in detour[1:-1]:
+                    claimed[node] = joins[reached[0]]
+        self.detour_cache[key] = detours
+        return detours
+
+    @staticmethod
+    def build_flow_delete(datapath, priority, match):
+        """
+        Builds a FlowMod removing exactly the entry with this priority and match
+        """
+        ofproto = datapath.ofproto
+        return datapath.ofproto_parser.OFPFlowMod(datapath=datapath, command=ofproto.OFPFC_DELETE_STRICT,
+                                                  priority=priority, out_port=ofproto.OFPP_ANY,
+                                                  out_group=ofproto.OFPG_ANY, match=match)
 
     def deploy_rule(self, src_dst, rule_id):
         """
@@ -352,63 +1695,788 @@ class BQoEPathApi(app_manager.RyuApp):
         self.logger.info("<deploy_rule> Path srcdst: %s, rule_id: %s", src_dst, rule_id)
         self.logger.debug("<deploy_rule> Possible paths: %s", self.possible_paths)
 
-        # flushing the rules on switches that belongs to a depoloyed path
-        if self.current_path:
-            switches_to_clear = [elem for elem in self.current_path if 'h' not in elem]
-            for switch in switches_to_clear:
-                datapath = self.dp_dict[int(switch[1:])]
-                parser = datapath.ofproto_parser
-                match = parser.OFPMatch(eth_type=0x0800)
-                mod = parser.OFPFlowMod(datapath=datapath,
-                                        command=datapath.ofproto.OFPFC_DELETE,
-                                        out_port=datapath.ofproto.OFPP_ANY,
-                                        out_group=datapath.ofproto.OFPP_ANY,
-                                        match=match)
-
         # Check to see if the src-dst pair has paths listed and if true deploy
         # the chosen path
-        if self.possible_paths.has_key(src_dst):
-            if self.possible_paths[src_dst].has_key(int(rule_id)):
-                path = self.possible_paths[src_dst][int(rule_id)]
-                print(path)
-                # [1, 2, 3, 4, 5, 6]
-                paths = [path, path[::-1]]
-                print(paths)
-                for path in paths:
-                    for i in range(1, len(path) - 1):
-                        # instaling rule for the i switch
-                        dpid = int(path[i][1:])
-                        _next = path[i + 1]
-                        datapath = self.dp_dict[dpid]
-                        parser = datapath.ofproto_parser
-                        ofproto = datapath.ofproto
-
-                        out_port = self.edges_ports["s%s" % dpid][_next]
-                        actions = [parser.OFPActionOutput(out_port)]
-                        self.logger.info("installing rule from %s to %s %s %s", path[i], path[i + 1], str(path[0][1:]),
-                                         str(path[-1][1:]))
-                        ip_src = "10.0.0." + str(path[0][1:])  # to get the id
-                        ip_dst = "10.0.0." + str(path[-1][1:])
-                        match = parser.OFPMatch(eth_type=0x0800, ipv4_src=ip_src, ipv4_dst=ip_dst)
-                        self.add_flow(datapath, 1024, match, actions)
-                self.current_path = path
+        if src_dst in self.possible_paths and int(rule_id) in self.possible_paths[src_dst]:
+            path = self.possible_paths[src_dst][int(rule_id)]
 
+            # flushing the flows of the previously deployed pair, the flows of any other pair stay
+            previous = self.current_path
+            if previous and set((previous[0], previous[-1])) != set((path[0], path[-1])):
+                self.remove_path_flows(previous)
+
+            self.deploy_any_path(path)
         else:
             return "Unknown path"
 
+    def remove_path_flows(self, path):
+        """
+        Removes the flows of both directions of path, in a single batch
+
+        Only entries matching exactly the src-dst pair of path are deleted, flows of
+        other users sharing the same switches are left alone.
+
+        Returns
+        -------
+        bool
+            True once every switch confirmed the removal
+        """
+        ip_a = self.ip_from_host(str(path[0]))
+        ip_b = self.ip_from_host(str(path[-1]))
+        batches = {}
+        for ip_src, ip_dst in ((ip_a, ip_b), (ip_b, ip_a)):
+            pair = (ip_src, ip_dst)
+            self.standby_switches.pop(pair, None)
+            for dpid in self.pair_switches.pop(pair, set()):
+                self.installed_flows.get(dpid, {}).pop(pair, None)
+                batches.setdefault(dpid, []).extend(self.build_pair_delete(self.dp_dict[dpid], pair))
+        return self.send_batches(batches)
+
+    def flow_counts(self):
+        """
+        Number of path flows installed on each switch {dpid: count}
+        """
+        return dict((dpid, len(flows)) for dpid, flows in self.installed_flows.items())
+
     def get_graph(self):
         return self.graph
 
-    def parse_graph(self):
+    def index_edges(self):
+        """
+        Indexes the graph edges by the host naming of their endpoints, so weight
+        rules are resolved without parsing switch names on every update
+        """
+        self.edge_index = {}
+        self.port_edges = {}
+        for u, v, e in self.graph.edges():
+            pair = (self.host_from_switch(u), self.host_from_switch(v))
+            self.edge_index.setdefault(pair, []).append(e)
+            for a, b in ((u, v), (v, u)):
+                dpid = self.registry.dpid.get(a)
+                if dpid is not None:
+                    self.port_edges[(dpid, self.graph.port(a, b))] = e
+
+    def load_weights(self, rules, default=DEFAULT_WEIGHT):
+        """
+        Applies a whole weight policy to the graph and drops every cached route
+
+        Parameters
+        ----------
+        rules : dict
+            {(p1, p2): weight}, see WEIGHT_RULES
+        default
+            weight of the links not listed in rules
+        """
+        self.base_weights[:] = default
+        for pair, weight in rules.items():
+            self.base_weights[self.edge_index.get(pair, [])] = weight
+        self.graph.set_weights(slice(None), self.effective_weights())
+        self.invalidate_routes()
+
+    def effective_weights(self, edges=slice(None)):
+        """
+        Routing weight of some edges: base weight plus congestion penalty, plus LINK_DOWN_PENALTY for dead links
+        """
+        return self.base_weights[edges] + self.weight_penalty[edges] + LINK_DOWN_PENALTY * self.link_down[edges]
+
+    def update_weights(self, deltas):
+        """
+        Changes the weight of some links, touching only those edges
+
+        Cached routes through a link that got heavier are dropped; a lighter link
+        may shorten any route, so in that case the whole table is dropped.
+
+        Parameters
+        ----------
+        deltas : list
+            [(src, dst, weight), ...], src and dst in host or switch naming.
+            Unlike WEIGHT_RULES, a delta matches the link in either orientation.
+
+        Returns
+        -------
+        int
+            number of edges whose weight changed
+
+        Raises
+        ------
+        ValueError
+            if a link does not exist or a weight is not positive and finite, nothing is applied then
+        """
+        resolved = []
+        for src, dst, weight in deltas:
+            p1 = self.host_from_switch(src)
+            p2 = self.host_from_switch(dst)
+            edges = self.edge_index.get((p1, p2)) or self.edge_index.get((p2, p1))
+            if not edges:
+                raise ValueError("Unknown link %s-%s" % (src, dst))
+            if not math.isfinite(weight) or weight <= 0:
+                raise ValueError("Weight of %s-%s must be positive and finite" % (src, dst))
+            resolved.append((edges, weight))
+
+        touched = []
+        for edges, weight in resolved:
+            self.base_weights[edges] = weight
+            touched.extend(edges)
+        return self.apply_weights(touched)
+
+    def apply_weights(self, edges=None):
+        """
+        Pushes base weight plus penalty of some edges to the graph
+
+        Cached routes through a link that got heavier are dropped; a lighter link
+        may shorten any route, so in that case the whole table is dropped.
+
+        Parameters
+        ----------
+        edges : list
+            edge ids to refresh, None refreshes every edge
+
+        Returns
+        -------
+        int
+            number of edges whose weight changed
+        """
+        edges = np.arange(self.graph.m) if edges is None else np.asarray(edges, dtype=np.int64)
+        wanted = self.effective_weights(edges)
+        current = self.graph.weights[edges]
+        diff = wanted != current
+        if not diff.any():
+            return 0
+
+        self.graph.set_weights(edges[diff], wanted[diff])
+        self.snapshot_dirty = True
+        names = self.graph.names
+        links = [(names[a], names[b]) for a, b in self.graph.ends[edges[diff]].tolist()]
+        if (wanted[diff] < current[diff]).any():
+            self.invalidate_routes()
+        else:
+            self.invalidate_routes(links)
+        weights = wanted[diff].tolist()
+        self.events.publish('weights', links=[dict(src=self.host_from_switch(u), dst=self.host_from_switch(v),
+                                                   weight=weight) for (u, v), weight in zip(links, weights)])
+        return int(diff.sum())
+
+    def telemetry_loop(self):
+        """
+        Polls port and flow stats from every switch, the replies are handled as they arrive
+        """
+        while True:
+            for datapath in list(self.dp_dict.values()):
+                parser = datapath.ofproto_parser
+                ofproto = datapath.ofproto
+                datapath.send_msg(parser.OFPPortStatsRequest(datapath, 0, ofproto.OFPP_ANY))
+                datapath.send_msg(parser.OFPFlowStatsRequest(datapath, 0, ofproto.OFPTT_ALL, ofproto.OFPP_ANY,
+                                                             ofproto.OFPG_ANY, 0, 0, parser.OFPMatch()))
+            hub.sleep(TELEMETRY_INTERVAL)
+            if CONGESTION_AWARE_ROUTING:
+                self.apply_congestion()
+            if self.events.subscribers:
+                self.publish_telemetry()
+
+    def publish_telemetry(self):
+        """
+        Publishes the links carrying traffic, with their load and loss
+        """
+        bps = self.telemetry.edge_bps()
+        loss = self.telemetry.edge_loss()
+        names = self.graph.names
+        busy = np.nonzero(bps > 0)[0]
+        self.events.publish('telemetry', links=[
+            dict(src=self.host_from_switch(names[a]), dst=self.host_from_switch(names[b]), bps=bps[e], loss=loss[e])
+            for e, (a, b) in zip(busy.tolist(), self.graph.ends[busy].tolist())])
+
+    def apply_congestion(self):
+        """
+        Penalizes the links the telemetry reports as congested and lifts the penalty of the others
+        """
+        penalty = np.where(self.telemetry.congested(), CONGESTION_PENALTY, 0.0)
+        edges = np.nonzero(penalty != self.weight_penalty)[0]
+        if len(edges):
+            self.weight_penalty[edges] = penalty[edges]
+            self.apply_weights(edges)
+
+    @set_ev_cls(ofp_event.EventOFPPortStatsReply, MAIN_DISPATCHER)
+    def port_stats_reply_handler(self, ev):
+        self.telemetry.add_port_stats(ev.msg.datapath.id, ev.msg.body)
+
+    @set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
+    def flow_stats_reply_handler(self, ev):
+        msg = ev.msg
+        if self.receive_dump(msg):
+            return  # the reconcile dump, not a sample of the telemetry poll
+        more = bool(msg.flags & msg.datapath.ofproto.OFPMPF_REPLY_MORE)
+        self.telemetry.add_flow_stats(msg.datapath.id, msg.body, more)
+
+    @set_ev_cls(ofp_event.EventOFPGroupDescStatsReply, MAIN_DISPATCHER)
+    def group_desc_stats_reply_handler(self, ev):
+        self.receive_dump(ev.msg)
+
+    def request_dumps(self, datapath, requests):
+        """
+        Sends the multipart requests whose replies make the dump reconcile_flows works on
+        """
+        self.reconciling[datapath.id] = dict((datapath.set_xid(request), ([], False)) for request in requests)
+        for request in requests:
+            datapath.send_msg(request)
+
+    def receive_dump(self, msg):
+        """
+        Collects a reply to the dump requests of a (re)connected switch, reconciling it once all are complete
+
+        Returns
+        -------
+        bool
+            True if msg answers one of them, only the replies to these requests make the dump
+        """
+        dumps = self.reconciling.get(msg.datapath.id, {})
+        if msg.xid not in dumps:
+            return False
+        stats = dumps[msg.xid][0]
+        stats.extend(msg.body)
+        dumps[msg.xid] = (stats, not msg.flags & msg.datapath.ofproto.OFPMPF_REPLY_MORE)
+        if all(complete for stats, complete in dumps.values()):
+            del self.reconciling[msg.datapath.id]
+            replies = [stat for stats, complete in dumps.values() for stat in stats]
+            group_desc = msg.datapath.ofproto_parser.OFPGroupDescStats
+            self.reconcile_flows(msg.datapath.id, [stat for stat in replies if not isinstance(stat, group_desc)],
+                                 [stat for stat in replies if isinstance(stat, group_desc)])
+        return True
+
+    def reconcile_flows(self, dpid, stats, group_stats=()):
+        """
+        Replaces the path flow index of a switch by what its flow table really holds
+
+        Flows found on the switch are adopted, so a warm restart does not install
+        them again; indexed flows the switch lost are forgotten and get installed
+        again by the next request for their pair. A group flow is only adopted with
+        the group the index holds for its pair, whose ports only the index knows:
+        any other path flow forwarding to a group is deleted, and so is every group
+        of the switch the index does not keep, so that switch and index agree.
+
+        Parameters
+        ----------
+        dpid : int
+            switch that sent the dump
+        stats : list
+            OFPFlowStats of its whole flow table
+        group_stats : list
+            OFPGroupDescStats of its group table, when it was dumped
+        """
+        datapath = self.dp_dict[dpid]
+        indexed = self.installed_flows.get(dpid, {})
+        groups = self.group_ids.get(dpid, {})
+        flows = {}
+        deletes = []
+        stray_groups = set(stat.group_id for stat in group_stats)
+        for stat in stats:
+            if stat.priority != PATH_PRIORITY:
+                continue
+            pair = (stat.match.get('ipv4_src'), stat.match.get('ipv4_dst'))
+            if None in pair or stat.cookie != self.pair_cookie(*pair):
+                continue  # not a path flow, e.g. a static nw_dst rule of Topo_DBR.py at the same priority
+            for instruction in stat.instructions:
+                for action in getattr(instruction, 'actions', []):
+                    if hasattr(action, 'port'):
+                        flows[pair] = action.port
+                    elif hasattr(action, 'group_id') and groups.get(pair) == action.group_id \
+                            and isinstance(indexed.get(pair), tuple):
+                        flows[pair] = indexed[pair]
+                    elif hasattr(action, 'group_id'):
+                        deletes.append(self.build_flow_delete(datapath, PATH_PRIORITY, stat.match))
+                        stray_groups.add(action.group_id)
+
+        lost = [pair for pair in indexed if pair not in flows]
+        for pair in set(groups) - set(pair for pair, out in flows.items() if isinstance(out, tuple)):
+            del groups[pair]
+        stray_groups -= set(groups.values())
+        deletes.extend(self.build_group_delete(datapath, group_id) for group_id in sorted(stray_groups))
+        for msg in deletes:
+            datapath.send_msg(msg)
+        for pair in lost:
+            self.forget_pair_switch(pair, dpid)
+        for pair in flows:
+            self.pair_switches.setdefault(pair, set()).add(dpid)
+        self.installed_flows[dpid] = flows
+        self.reconciled.add(dpid)
+        self.snapshot_dirty = True
+        self.logger.info("s%s reconciled: %d path flows on the switch, %d indexed flows lost, %d stray groups "
+                         "deleted", dpid, len(flows), len(lost), len(stray_groups))
+        self.events.publish('reconcile', dpid=dpid, flows=len(flows), lost=len(lost))
+
+    def ready(self):
+        """
+        True once every switch of the topology is connected and reconciled
         """
-        Parses the topology.txt file and creates a graph from it
+        return not self.reconciling and set(self.registry.name_by_dpid) <= self.reconciled
 
+    def snapshot_fingerprint(self):
         """
+        What a snapshot was taken against: topology dump and routing policy
+        """
+        digest = hashlib.sha1()
+        with open(TOPOLOGY_FILE, 'rb') as topology:
+            digest.update(topology.read())
+        digest.update(repr((sorted(WEIGHT_RULES.items()), DEFAULT_WEIGHT, CDN_HOSTS)).encode('utf-8'))
+        return digest.hexdigest()
 
-        file = open('topology.txt', 'r')
+    def read_snapshot(self):
+        """
+        Loads SNAPSHOT_FILE, None if snapshots are disabled, or it is missing, unreadable or stale
+        """
+        if not SNAPSHOT_FILE or not os.path.exists(SNAPSHOT_FILE):
+            return None
+        try:
+            with open(SNAPSHOT_FILE, 'rb') as stored:
+                snapshot = pickle.load(stored)
+            stale = snapshot.get('fingerprint') != self.snapshot_fingerprint()
+            if snapshot.get('version') != SNAPSHOT_VERSION or stale:
+                self.logger.info("ignoring %s, taken for another topology or policy", SNAPSHOT_FILE)
+                return None
+        except Exception as e:
+            self.logger.warning("ignoring unreadable %s: %s", SNAPSHOT_FILE, e)
+            return None
+        return snapshot
+
+    def restore_snapshot(self, snapshot):
+        """
+        Puts back weights, route table, flow index and reservations of a snapshot
+        """
+        self.base_weights[:] = snapshot['base_weights']
+        self.weight_penalty[:] = snapshot['weight_penalty']
+        self.graph.set_weights(slice(None), self.effective_weights())
+        self.invalidate_routes()
+        for key, routes in snapshot['route_table'].items():
+            self.cache_routes(key, routes)
+        self.installed_flows = snapshot['installed_flows']
+        self.pair_switches = snapshot['pair_switches']
+        self.standby_switches = snapshot['standby_switches']
+        self.group_ids = snapshot['group_ids']
+        self.next_group_ids = dict((dpid, itertools.count(max(groups.values()) + 1))
+                                   for dpid, groups in self.group_ids.items() if groups)
+        self.admission.reserved[:] = snapshot['reserved']
+        self.admission.sessions = snapshot['sessions']
+        self.admission.session_ids = itertools.count(snapshot['next_session'])
+        self.ongoingVideos = snapshot['videos']
+        self.logger.info("warm start from %s: %d routes, %d path flows, %d videos", SNAPSHOT_FILE,
+                         len(self.route_table), sum(len(flows) for flows in self.installed_flows.values()),
+                         len(self.ongoingVideos))
+
+    def save_snapshot(self):
+        """
+        Writes the state to SNAPSHOT_FILE, atomically
+
+        Returns
+        -------
+        int
+            size of the snapshot in bytes, 0 if snapshots are disabled
+        """
+        if not SNAPSHOT_FILE:
+            return 0
+        sessions = self.admission.sessions
+        snapshot = dict(version=SNAPSHOT_VERSION, fingerprint=self.snapshot_fingerprint(), elist=self.elist,
+                        edges_ports=self.edges_ports, link_capacities=self.link_capacities,
+                        base_weights=self.base_weights, weight_penalty=self.weight_penalty,
+                        route_table=self.route_table, installed_flows=self.installed_flows,
+                        pair_switches=self.pair_switches, standby_switches=self.standby_switches,
+                        group_ids=self.group_ids, reserved=self.admission.reserved, sessions=sessions,
+                        next_session=max(sessions) + 1 if sessions else 1, videos=self.ongoingVideos)
+        data = pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL)
+        partial = SNAPSHOT_FILE + '.tmp'
+        with open(partial, 'wb') as stored:
+            stored.write(data)
+        os.rename(partial, SNAPSHOT_FILE)
+        self.snapshot_dirty = False
+        return len(data)
+
+    def snapshot_loop(self):
+        """
+        Saves the state every SNAPSHOT_INTERVAL while it keeps changing
+        """
+        while True:
+            hub.sleep(SNAPSHOT_INTERVAL)
+            if self.snapshot_dirty:
+                try:
+                    self.save_snapshot()
+                except (IOError, OSError) as e:
+                    self.logger.warning("could not save %s: %s", SNAPSHOT_FILE, e)
+
+    def stop(self):
+        if self.snapshot_dirty:
+            self.save_snapshot()
+        super(BQoEPathApi, self).stop()
+
+    def map_access_switches(self):
+        """
+        Maps every single-homed host (users, CDNs, aux hosts) to its switch
+        """
+        self.access_switch = {}
+        for node in self.graph.nodes():
+            neighbors = self.graph.neighbors(node)
+            if not node.startswith('s') and len(neighbors) == 1 and neighbors[0].startswith('s'):
+                self.access_switch[node] = neighbors[0]
+
+    def invalidate_routes(self, links=None):
+        """
+        Drops cached routes, must be called whenever weights or topology change
+
+        Parameters
+        ----------
+        links : list
+            [(u, v), ...] only drop the routes using these links, None drops everything
+        """
+        self.k_paths = {}
+        self.detour_cache = {}
+        self.routes_version += 1
+        if links is None:
+            self.route_table = {}
+            self.route_deps = {}
+            return
+        for u, v in links:
+            for key in self.route_deps.pop(frozenset((u, v)), ()):
+                self.route_table.pop(key, None)
+
+    def build_route_table(self, candidates):
+        """
+        Precomputes the routes from every access switch to the candidates
+
+        Parameters
+        ----------
+        candidates : list
+            destinations to be cached (e.g. CDN_HOSTS)
+        """
+        for switch in set(self.access_switch.values()):
+            self.cache_routes((switch, frozenset(candidates)), self.compute_routes(switch, candidates))
+
+    def routes_from(self, anchor, candidates):
+        """
+        Returns the cached routes from anchor to candidates, computing them on a miss
+
+        Misses are computed on the path worker pool.
+
+        Returns
+        -------
+        dict
+            {cdn: (distance, [cdn, ..., anchor])} for every reachable candidate
+        """
+        key = (anchor, frozenset(candidates))
+        routes = self.route_table.get(key)
+        if routes is None:
+            version = self.routes_version
+            routes = self.path_pool.execute(self.compute_routes, anchor, candidates, weights=self.graph.weights_list())
+            if version == self.routes_version:
+                self.cache_routes(key, routes)
+        return routes
+
+    def compute_routes(self, anchor, candidates, ignored_edges=(), weights=None):
+        """
+        Shortest routes from anchor to candidates, without touching the route table
+
+        Parameters
+        ----------
+        anchor : str
+            node the routes start from
+        candidates : list
+            destinations to be considered
+        ignored_edges : set
+            edge ids the routes must not use
+        weights : list
+            edge weights, taken on the controller thread when this runs on a path worker
+
+        Returns
+        -------
+        dict
+            {cdn: (distance, [cdn, ..., anchor])} for every reachable candidate
+        """
+        graph = self.graph
+        index = graph.index
+        names = graph.names
+        targets = [index[dest] for dest in candidates if dest in index]
+        dist, prev = graph.dijkstra(index[anchor], targets, ignored_edges=ignored_edges, weights=weights)
+        routes = {}
+        for t in targets:
+            if t in dist:
+                routes[names[t]] = (dist[t], [names[node] for node in graph.walk_back(prev, index[anchor], t)])
+        return routes
+
+    def cache_routes(self, key, routes):
+        """
+        Stores routes in the route table, indexed by the links they use
+        """
+        self.route_table[key] = routes
+        self.snapshot_dirty = True
+        for splen, sp in routes.values():
+            for i in range(len(sp) - 1):
+                self.route_deps.setdefault(frozenset((sp[i], sp[i + 1])), set()).add(key)
+
+    def route_lookup(self, src, candidates):
+        """
+        Routes from src to each candidate, served from the route table
+
+        Hosts share the routes of their access switch, so the table is keyed by
+        switch instead of by user.
+
+        Parameters
+        ----------
+        src : str
+            node requesting the routes (e.g. 'u001')
+        candidates : list
+            destinations to be considered
+
+        Returns
+        -------
+        dict
+            {cdn: (distance, [cdn, ..., src])} for every reachable candidate
+        """
+        anchor = self.access_switch.get(src)
+        if anchor is None or src in candidates:
+            return self.routes_from(src, candidates)
+
+        hop = self.graph.weight(src, anchor)
+        routes = {}
+        for dest, (splen, sp) in self.routes_from(anchor, candidates).items():
+            routes[dest] = (splen + hop, sp + [src])
+        return routes
+
+    def admit_video(self, src, candidates, bitrate=BW_BITRATE):
+        """
+        Picks the closest candidate whose path has room for one more video and reserves it
+
+        The cached shortest routes are tried first, closest candidate first; if all
+        of them cross a saturated link the routes are recomputed around the saturated
+        links. With ADMISSION_CONTROL off the shortest route is always taken, but it
+        is still reserved so the link usage stays visible.
+
+        Parameters
+        ----------
+        src : str
+            user requesting the video (e.g. 'u001')
+        candidates : list
+            CDNs able to serve it, ties are broken by their order
+        bitrate : float
+            bandwidth (bps) to reserve
+
+        Returns
+        -------
+        tuple
+            (session, [cdn, ..., src]) or (None, None) if no candidate can be reached with enough capacity
+        """
+        chosen = self.choose_route(src, candidates, bitrate)
+        if chosen is None:
+            self.events.publish('denial', src=src, candidates=list(candidates), bitrate=bitrate)
+            return None, None
+        sp, edges = chosen
+        session = self.admission.reserve(edges, bitrate)
+        video = dict(src=src, dst=self.registry.to_human(sp[0]), path=self.registry.humanize(sp), bitrate=bitrate,
+                     start=time.time())
+        self.ongoingVideos[session] = video
+        self.snapshot_dirty = True
+        self.events.publish('admission', session=session, src=src, dst=video['dst'], path=video['path'],
+                            bitrate=bitrate)
+        return session, sp
+
+    def choose_route(self, src, candidates, bitrate=BW_BITRATE):
+        """
+        Closest route from a candidate to src that has room for bitrate and only uses live links
+
+        Returns
+        -------
+        tuple
+            ([cdn, ..., src], edge ids) or None
+        """
+        admission = self.admission
+        with self.metrics.time('route_lookup'):
+            routes = self.route_lookup(src, candidates)
+        ranked = sorted((routes[dest] for dest in candidates if dest in routes), key=lambda route: route[0])
+
+        for splen, sp in ranked:
+            if splen >= LINK_DOWN_PENALTY:
+                break
+            edges = admission.path_edges(sp)
+            if not ADMISSION_CONTROL or admission.fits(edges, bitrate):
+                return sp, edges
+
+        if ranked:
+            ignored = admission.saturated(bitrate) if ADMISSION_CONTROL else set()
+            ignored.update(np.nonzero(self.link_down)[0].tolist())
+            with self.metrics.time('reroute'):
+                detours = self.path_pool.execute(self.compute_routes, src, candidates, ignored,
+                                                 self.graph.weights_list())
+            for splen, sp in sorted((detours[dest] for dest in candidates if dest in detours),
+                                    key=lambda route: route[0]):
+                edges = admission.path_edges(sp)
+                if not ADMISSION_CONTROL or admission.fits(edges, bitrate):  # reservations may have changed
+                    return sp, edges
+        return None
+
+    def reroute_link(self, edge):
+        """
+        Moves every video crossing a dead link to a new route, their flows go out in a single batch
+
+        Until then the fast-failover groups keep the videos on the detours; a video
+        without any other route, or whose detour search found the path workers busy,
+        keeps its reservation on the dead link.
+        """
+        admission = self.admission
+        paths = []
+        stranded = []
+        for session, (edges, bitrate) in list(admission.sessions.items()):
+            video = self.ongoingVideos.get(session)
+            if video is None or not (edges == edge).any():
+                continue
+            admission.release(session)  # its own reservation must not keep the video off a new route
+            try:
+                chosen = self.choose_route(video['src'], [video['dst']], bitrate)
+            except PathPoolFull:
+                self.logger.warning("path workers busy, session %s stays on the detours of the dead link", session)
+                chosen = None
+            if chosen is None:
+                admission.reserve(edges, bitrate, session)
+                stranded.append(session)
+                continue
+            sp, edges = chosen
+            admission.reserve(edges, bitrate, session)
+            video['path'] = self.registry.humanize(sp)
+            paths.append(video['path'])
+
+        installed = self.deploy_paths(paths) if paths else True
+        self.snapshot_dirty = True
+        self.logger.info("%d videos rerouted around a dead link, %d without another route", len(paths),
+                         len(stranded))
+        self.events.publish('reroute', paths=paths, stranded=stranded, installed=installed)
+
+    @set_ev_cls(ofp_event.EventOFPPortStatus, MAIN_DISPATCHER)
+    def port_status_handler(self, ev):
+        """
+            Tracks links going down and up, rerouting the videos of a dead link
+        """
+        msg = ev.msg
+        ofproto = msg.datapath.ofproto
+        edge = self.port_edges.get((msg.datapath.id, msg.desc.port_no))
+        if edge is None:
+            return
+        down = (msg.reason == ofproto.OFPPR_DELETE or bool(msg.desc.state & ofproto.OFPPS_LINK_DOWN)
+                or bool(msg.desc.config & ofproto.OFPPC_PORT_DOWN))
+        if down == self.link_down[edge]:
+            return  # already known, e.g. from the switch on the other end
+
+        self.link_down[edge] = down
+        self.apply_weights([edge])
+        self.detour_cache = {}
+        self.bridge_edges = None
+        names = self.graph.names
+        u, v = [self.host_from_switch(names[node]) for node in self.graph.ends[edge].tolist()]
+        self.logger.warning("link %s-%s is %s", u, v, 'down' if down else 'up')
+        self.events.publish('link', src=u, dst=v, up=not down)
+        if down:
+            # rerouting waits for barriers, which are answered by this event loop
+            hub.spawn(self.reroute_link, edge)
+
+    def admit_videos(self, requests, mode=None):
+        """
+        Admits a burst of videos in one pass and installs all their flows together
+
+        Reservations are taken in request order, so a later request sees the
+        bandwidth taken by the earlier ones; the flows of every admitted video go
+        out merged into a single batch per switch.
+
+        Parameters
+        ----------
+        requests : list
+            [(src, candidates), ...] as for admit_video
+        mode : str
+            'none', 'barrier' or 'bundle', defaults to FLOW_INSTALL_MODE
+
+        Returns
+        -------
+        admitted, installed : list, bool
+            (session, path in host naming) per request, (None, None) when denied, and
+            whether the switches confirmed the flows
+        """
+        for src, candidates in requests:
+            if src not in self.graph.index:
+                raise ValueError("unknown node %s" % src)
+
+        admitted = []
+        try:
+            for src, candidates in requests:
+                admitted.append(self.admit_video(src, candidates))
+        except PathPoolFull:
+            for session, sp in admitted:
+                if session is not None:
+                    self.release_video(session)
+            raise
+
+        admitted = [(session, None if sp is None else self.registry.humanize(sp)) for session, sp in admitted]
+        paths = [path for session, path in admitted if session is not None]
+        installed = self.deploy_paths(paths, mode) if paths else True
+        return admitted, installed
+
+    def release_video(self, session):
+        """
+        Ends a video, giving back the bandwidth reserved for it
+
+        Returns
+        -------
+        bool
+            False if session is not an ongoing video
+        """
+        self.ongoingVideos.pop(session, None)
+        released = self.admission.release(session)
+        if released:
+            self.snapshot_dirty = True
+            self.events.publish('release', session=session)
+        return released
+
+    def shortest_simple_paths(self, source, target, weights=None):
+        """
+        Lazily yields the loopless paths from source to target by increasing length (Yen)
+        """
+        names = self.graph.names
+        for path in self.graph.shortest_simple_paths(self.graph.index[source], self.graph.index[target], weights):
+            yield [names[node] for node in path]
+
+    def k_shortest_paths(self, source, target, k):
+        """
+        The k shortest loopless paths from source to target (fewer if there are no more)
+
+        Results are cached per host pair until weights or topology change, misses
+        are computed on the path worker pool.
+        """
+        key = (source, target)
+        cached = self.k_paths.get(key)
+        if cached is not None and (len(cached[0]) >= k or cached[1]):
+            return cached[0][:k]
+
+        version = self.routes_version
+        weights = self.graph.weights_list()
+        paths = self.path_pool.execute(
+            lambda: list(itertools.islice(self.shortest_simple_paths(source, target, weights), k)))
+        if version == self.routes_version:
+            self.k_paths[key] = (paths, len(paths) < k)
+        return paths
+
+    def parse_graph(self, topology_file=None):
+        """
+        Parses the topology file and creates a graph from it
+
+        Parameters
+        ----------
+        topology_file : str
+            topology descriptor (.json) to dump first, whose link capacities are kept, or a
+            Mininet 'net' dump to parse, defaults to TOPOLOGY_FILE
+        """
+
+        topology_file = topology_file or TOPOLOGY_FILE
+        if topology_file.endswith('.json'):
+            descriptor = topo_descriptor.load(topology_file)
+            self.link_capacities = topo_descriptor.link_capacities(descriptor)
+            file = topo_descriptor.net_dump(descriptor)
+        else:
+            file = open(topology_file, 'r')
         reg = re.compile('-eth([0-9]+):([\w]+)-eth[0-9]+')
         reg_switch = re.compile('(s[0-9]+) lo')
 
+        known = set()
         for line in file:
             if "lo:" in line:
                 reference_node = (reg_switch.match(line)).group(1)
@@ -416,8 +2484,9 @@ class BQoEPathApi(app_manager.RyuApp):
                 self.edges_ports.setdefault(reference_node, {})
                 for conn in reg.findall(connections):
                     self.edges_ports[reference_node][conn[1]] = int(conn[0])
-                    self.elist.append((reference_node, conn[1])) if (
-                                                                    conn[1], reference_node) not in self.elist else None
+                    if (conn[1], reference_node) not in known:
+                        known.add((reference_node, conn[1]))
+                        self.elist.append((reference_node, conn[1]))
 
     @staticmethod
     def send_arp(datapath, arp_opcode, src_mac, dst_mac,
@@ -480,49 +2549,229 @@ class BQoEPathController(ControllerBase):
         super(BQoEPathController, self).__init__(req, link, data, **config)
         self.bqoe_path_spp = data[bqoe_path_api_instance_name]
 
+    @route('bqoepath', url, methods=['GET'], requirements={'method': r'deploybestqoepath-test-all|ready'})
+    @timed_endpoint
+    def readiness(self, req, **kwargs):
+        """
+        Readiness probe polled by video_launcher.sh: path is NO_SNAPSHOT until every switch is connected and reconciled
+        """
+        api = self.bqoe_path_spp
+        result = dict(switches=len(api.reconciled), expected=len(api.registry.name_by_dpid),
+                      warm_start=api.snapshot_loaded)
+        if api.ready():
+            result.update(path="READY")
+            status = 200
+        else:
+            result.update(path="NO_SNAPSHOT", reconciling=sorted(api.reconciling))
+            status = 503
+        body = json.dumps(result, indent=4)
+        return Response(status=status, content_type='application/json', body=body, charset="UTF-8")
+
+    @route('bqoepath', url, methods=['POST'], requirements={'method': r'snapshot'})
+    @timed_endpoint
+    def snapshot(self, req, **kwargs):
+        """
+        Saves the controller state right away
+        """
+        try:
+            size = self.bqoe_path_spp.save_snapshot()
+        except (IOError, OSError) as e:
+            body = json.dumps(dict(error=str(e)), indent=4)
+            return Response(status=500, content_type='application/json', body=body, charset="UTF-8")
+        body = json.dumps(dict(file=SNAPSHOT_FILE, bytes=size), indent=4)
+        return Response(content_type='application/json', body=body, charset="UTF-8")
+
     @route('bqoepath', url, methods=['GET'], requirements={'method': r'admweights-[a-z0-9\-]*'})
+    @timed_endpoint
     def adm_weights(self, req, **kwargs):
         src = kwargs['method'][11:].split('-')[0]
         dst = kwargs['method'][11:].split('-')[1]
 
-        graph = self.bqoe_path_spp.get_graph()
-        for u, v, d in graph.edges(data=True):
-            p1 = self.bqoe_path_spp.host_from_switch(u)
-            p2 = self.bqoe_path_spp.host_from_switch(v)
-            if ((p1 == "a2" and p2 == "a3") or (p1 == "c2" and p2 == "c1") or (p1 == "m5" and p2 == "m1") or (
-                    p1 == "a1" and p2 == "a4") or (p1 == "m3" and p2 == "m2")):
-                d['weight'] = 1000
-            elif (p1 == "m5" and p2 == "m4"):
-                d['weight'] = 3
-            else:
-                d['weight'] = 1
-
-        min_splen = 100000000
-        min_sp = []
         if dst == "all":
-            destinations_array = ["cdn1", "cdn2", "cdn3", "ext1"]
+            destinations_array = list(CDN_HOSTS)
             random.shuffle(destinations_array)
-            for dest in destinations_array:
-                prev, dist = nx.algorithms.shortest_paths.bellman_ford_predecessor_and_distance(graph, source=src,
-                                                                                                weight='weight')
-                sp = [dest]
-                pv = prev[dest][0]
-                while pv != src:
-                    sp.append(pv)
-                    pv = prev[pv][0]
-                sp.append(src)
-
-                splen = dist[dest]
-                if splen < min_splen:
-                    min_sp = sp
-                    min_splen = splen
-
-        humanmin_sp = []
-        for elem in min_sp:
-            humanmin_sp.append(self.bqoe_path_spp.host_from_switch(elem))
-
-        result = dict(dst=humanmin_sp[0], dest_ip=self.bqoe_path_spp.ip_from_host(humanmin_sp[0]), path=humanmin_sp)
-        self.bqoe_path_spp.deploy_any_path(humanmin_sp)
+        else:
+            destinations_array = [dst]
+        metrics = self.bqoe_path_spp.metrics
+        try:
+            with metrics.time('admission'):
+                session, min_sp = self.bqoe_path_spp.admit_video(src, destinations_array)
+        except PathPoolFull:
+            body = json.dumps(dict(path="BUSY"), indent=4)
+            return Response(status=503, content_type='application/json', body=body, charset="UTF-8")
+        if session is None:
+            body = json.dumps(dict(path="NO_ROUTE"), indent=4)
+            return Response(content_type='application/json', body=body, charset="UTF-8")
+
+        with metrics.time('translate'):
+            humanmin_sp = self.bqoe_path_spp.registry.humanize(min_sp)
+
+        with metrics.time('deploy'):
+            installed = self.bqoe_path_spp.deploy_any_path(humanmin_sp)
+        result = dict(dst=humanmin_sp[0], dest_ip=self.bqoe_path_spp.ip_from_host(humanmin_sp[0]), path=humanmin_sp,
+                      installed=installed, session=session)
 
         body = json.dumps(result, indent=4)
         return Response(content_type='application/json', body=body, charset="UTF-8")
+
+    @route('bqoepath', url, methods=['POST'], requirements={'method': r'admit'})
+    @timed_endpoint
+    def admit(self, req, **kwargs):
+        """
+        Admits many videos at once, body: [{"src": "u001", "dst": "all", "video_id": "muse", "uuid": "..."}, ...]
+
+        Answers one entry per request, in order, shaped as the admweights answer
+        plus the video_id and uuid of the request.
+        """
+        api = self.bqoe_path_spp
+        try:
+            videos = json.loads(req.body)
+            requests = []
+            for video in videos:
+                dst = video.get('dst', 'all')
+                if dst == "all":
+                    destinations_array = list(CDN_HOSTS)
+                    random.shuffle(destinations_array)
+                else:
+                    destinations_array = [dst]
+                requests.append((video['src'], destinations_array))
+            admitted, installed = api.admit_videos(requests)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            body = json.dumps(dict(error=str(e)), indent=4)
+            return Response(status=400, content_type='application/json', body=body, charset="UTF-8")
+        except PathPoolFull:
+            body = json.dumps(dict(path="BUSY"), indent=4)
+            return Response(status=503, content_type='application/json', body=body, charset="UTF-8")
+
+        results = []
+        for video, (session, path) in zip(videos, admitted):
+            if session is None:
+                result = dict(path="NO_ROUTE")
+            else:
+                result = dict(dst=path[0], dest_ip=api.ip_from_host(path[0]), path=path, installed=installed,
+                              session=session)
+            result.update(video_id=video.get('video_id'), uuid=video.get('uuid'))
+            results.append(result)
+
+        body = json.dumps(results, indent=4)
+        return Response(content_type='application/json', body=body, charset="UTF-8")
+
+    @route('bqoepath', url, methods=['GET'], requirements={'method': r'events(-[0-9]+)?'})
+    @timed_endpoint
+    def recent_events(self, req, **kwargs):
+        """
+        Kept events, or with events-<seq> only those after seq
+        """
+        since = kwargs['method'][7:]
+        events = self.bqoe_path_spp.events.recent(int(since) if since else None)
+        body = json.dumps(events, indent=4)
+        return Response(content_type='application/json', body=body, charset="UTF-8")
+
+    @websocket('bqoepath', '/bqoepath/events/ws')
+    def events_ws(self, ws):
+        """
+        Streams every new event as a JSON text message until the client goes away or falls behind
+        """
+        bus = self.bqoe_path_spp.events
+        queue = bus.subscribe(since=bus.ring[-1]['seq'] if bus.ring else None)
+        try:
+            while True:
+                event = queue.get()
+                if event is None:
+                    break
+                ws.send(json.dumps(event))
+        finally:
+            bus.unsubscribe(queue)
+
+    @route('bqoepath', url, methods=['GET'], requirements={'method': r'metrics'})
+    def metrics(self, req, **kwargs):
+        """
+        Stage latencies, counters and gauges in the Prometheus text exposition format
+        """
+        api = self.bqoe_path_spp
+        pool = api.path_pool.stats()
+        gauges = [
+            ('bqoepath_ongoing_videos', 'Videos holding a bandwidth reservation', len(api.ongoingVideos)),
+            ('bqoepath_installed_flows', 'Path flows known to be installed on the switches',
+             sum(len(flows) for flows in api.installed_flows.values())),
+            ('bqoepath_path_queue', 'Path computations waiting for a worker', pool['queued']),
+            ('bqoepath_path_running', 'Path computations running on a worker', pool['running']),
+            ('bqoepath_path_rejected_total', 'Path computations refused because the queue was full', pool['rejected']),
+            ('bqoepath_event_subscribers', 'Clients following the event feed', len(api.events.subscribers)),
+        ]
+        return Response(content_type='text/plain', body=api.metrics.exposition(gauges), charset="UTF-8")
+
+    @route('bqoepath', url, methods=['GET'], requirements={'method': r'flows'})
+    @timed_endpoint
+    def flows(self, req, **kwargs):
+        """
+        Path flows installed per switch, {"s1": 4, ...}
+        """
+        counts = dict(("s%s" % dpid, count) for dpid, count in self.bqoe_path_spp.flow_counts().items())
+        body = json.dumps(counts, indent=4, sort_keys=True)
+        return Response(content_type='application/json', body=body, charset="UTF-8")
+
+    @route('bqoepath', url, methods=['GET'], requirements={'method': r'workers'})
+    @timed_endpoint
+    def workers(self, req, **kwargs):
+        """
+        Queue and load of the path worker pool
+        """
+        body = json.dumps(self.bqoe_path_spp.path_pool.stats(), indent=4, sort_keys=True)
+        return Response(content_type='application/json', body=body, charset="UTF-8")
+
+    @route('bqoepath', url, methods=['GET'], requirements={'method': r'links'})
+    @timed_endpoint
+    def links(self, req, **kwargs):
+        """
+        Measured load (bps), loss ratio, current weight, reserved bandwidth and state of every link
+        """
+        api = self.bqoe_path_spp
+        bps = api.telemetry.edge_bps().tolist()
+        loss = api.telemetry.edge_loss().tolist()
+        weights = api.graph.weights_list()
+        capacity = api.admission.capacity.tolist()
+        reserved = api.admission.reserved.tolist()
+        down = api.link_down.tolist()
+        links = [dict(src=api.host_from_switch(u), dst=api.host_from_switch(v), bps=bps[e], loss=loss[e],
+                      weight=weights[e], capacity=capacity[e], reserved=reserved[e], down=down[e])
+                 for u, v, e in api.graph.edges()]
+        body = json.dumps(links, indent=4)
+        return Response(content_type='application/json', body=body, charset="UTF-8")
+
+    @route('bqoepath', url, methods=['GET'], requirements={'method': r'videos'})
+    @timed_endpoint
+    def videos(self, req, **kwargs):
+        """
+        Ongoing videos by session
+        """
+        body = json.dumps(self.bqoe_path_spp.ongoingVideos, indent=4, sort_keys=True)
+        return Response(content_type='application/json', body=body, charset="UTF-8")
+
+    @route('bqoepath', url, methods=['POST'], requirements={'method': r'release-[0-9]+'})
+    @timed_endpoint
+    def release(self, req, **kwargs):
+        """
+        Ends the video of a session (as returned by admweights), freeing its bandwidth
+        """
+        session = int(kwargs['method'][8:])
+        released = self.bqoe_path_spp.release_video(session)
+        body = json.dumps(dict(session=session, released=released), indent=4)
+        return Response(status=200 if released else 404, content_type='application/json', body=body,
+                        charset="UTF-8")
+
+    @route('bqoepath', url, methods=['POST'], requirements={'method': r'weights'})
+    @timed_endpoint
+    def update_weights(self, req, **kwargs):
+        """
+        Applies link weight deltas, body: [{"src": "a2", "dst": "a3", "weight": 1000}, ...]
+        """
+        try:
+            deltas = [(d['src'], d['dst'], float(d['weight'])) for d in json.loads(req.body)]
+            changed = self.bqoe_path_spp.update_weights(deltas)
+        except (ValueError, KeyError, TypeError) as e:
+            body = json.dumps(dict(error=str(e)), indent=4)
+            return Response(status=400, content_type='application/json', body=body, charset="UTF-8")
+
+        body = json.dumps(dict(changed=changed), indent=4)
+        return Response(content_type='application/json', body=body, charset="UTF-8")
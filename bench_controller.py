@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+"""
+Controller microbenchmark: replays request traces against BQoEPathApi without Mininet or OVS
+
+The controller graph is built from TOPOLOGY_FILE or from a generated provider
+topology (topo_descriptor.generate) made of several copies of the metro/access
+region of the experiment topology, and every switch is a StubDatapath recording
+FlowMods. Each trace line goes through adm_weights exactly as a video_launcher.sh request would (with --wsgi
+through the whole REST stack, URL routing included), and through the bare path
+engine (cold shortest routes and k shortest paths).
+
+    $ python3 bench_controller.py --regions 10 traces/dash-load.csv
+    $ python3 bench_controller.py --wsgi --latency 0.002 --repeat 10
+"""
+from ryu.lib import hub
+
+hub.patch(thread=False)  # as ryu-manager does, the path workers still need real threads
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import resource
+import tempfile
+
+import numpy as np
+from ryu.app.wsgi import WSGIApplication
+from webob import Request
+
+import Controller_DBR
+import stub_datapath
+import topo_descriptor
+
+
+def read_trace(path):
+    """
+    Users of a trace file, one per line (user;quality;sleep;...)
+    """
+    with open(path) as trace:
+        return [line.split(';')[0] for line in trace if line.strip()]
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def summarize(name, latencies, wall):
+    latencies = np.asarray(latencies) * 1000.0
+    return dict(name=name, count=len(latencies), mean_ms=float(latencies.mean()),
+                p50_ms=float(np.percentile(latencies, 50)), p99_ms=float(np.percentile(latencies, 99)),
+                max_ms=float(latencies.max()), ops_per_s=len(latencies) / wall if wall > 0 else 0.0)
+
+
+def timed(fn, *args):
+    """
+    Calls fn(*args), returns (seconds elapsed, result)
+    """
+    start = Controller_DBR.timer()
+    result = fn(*args)
+    return Controller_DBR.timer() - start, result
+
+
+def bench_adm_weights(app, ctl, users, keep, wsgi=None):
+    """
+    Runs every user through GET admweights-<user>-all, through the WSGI application if given
+    """
+    latencies = []
+    outcomes = {}
+    start = Controller_DBR.timer()
+    for user in users:
+        if wsgi is None:
+            elapsed, response = timed(lambda: ctl.adm_weights(None, method="admweights-%s-all" % user))
+        else:
+            elapsed, response = timed(lambda: Request.blank("/bqoepath/admweights-%s-all" % user).get_response(wsgi))
+        latencies.append(elapsed)
+        answer = json.loads(response.body)
+        outcome = answer['path'] if response.status_code != 200 or 'session' not in answer else 'ADMITTED'
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        if 'session' in answer and not keep:
+            app.release_video(answer['session'])
+    return summarize('adm_weights', latencies, Controller_DBR.timer() - start), outcomes
+
+
+def bench_routes(app, users):
+    """
+    Cold shortest routes from every user to all the CDNs, bypassing the route table
+    """
+    latencies = []
+    start = Controller_DBR.timer()
+    for user in users:
+        latencies.append(timed(app.compute_routes, user, Controller_DBR.CDN_HOSTS)[0])
+    return summarize('compute_routes', latencies, Controller_DBR.timer() - start)
+
+
+def bench_k_paths(app, users, k):
+    """
+    The k shortest paths from a random CDN to every user, bypassing the path cache
+    """
+    latencies = []
+    start = Controller_DBR.timer()
+    for user in users:
+        cdn = random.choice(Controller_DBR.CDN_HOSTS)
+        latencies.append(timed(lambda: list(itertools.islice(app.shortest_simple_paths(cdn, user), k)))[0])
+    return summarize('k_shortest_paths', latencies, Controller_DBR.timer() - start)
+
+
+def run(args):
+    random.seed(args.seed)
+    Controller_DBR.FLOW_INSTALL_MODE = args.mode
+    Controller_DBR.SNAPSHOT_FILE = None  # always a cold start, and nothing left behind
+
+    topology = args.topology
+    if args.regions:
+        handle, topology = tempfile.mkstemp(prefix='bench-topology-', suffix='.json')
+        os.close(handle)
+        topo_descriptor.save(topo_descriptor.generate(args.regions, args.users_per_ran), topology)
+    Controller_DBR.TOPOLOGY_FILE = topology
+
+    wsgi = WSGIApplication()
+    rss_before = rss_mb()
+    startup, app = timed(lambda: Controller_DBR.BQoEPathApi(wsgi=wsgi, dpset=None))
+    datapaths = stub_datapath.attach(app, latency=args.latency)
+    ctl = Controller_DBR.BQoEPathController(None, None, wsgi.registory[Controller_DBR.BQoEPathController.__name__])
+    if args.regions:
+        os.remove(topology)
+
+    users = []
+    for trace in args.traces:
+        users.extend(read_trace(trace))
+    if args.random:
+        population = [name for name in app.graph.names if app.registry.role.get(name) == 'user']
+        users.extend(random.choice(population) for _ in range(args.random))
+    users = [user for user in users * args.repeat if user in app.graph.index]
+    if not users:
+        raise SystemExit("no request of the traces matches a user of the topology")
+
+    results = [bench_adm_weights(app, ctl, users, args.keep, wsgi if args.wsgi else None),
+               bench_routes(app, users), bench_k_paths(app, users, args.k)]
+    report = dict(nodes=app.graph.n, links=app.graph.m, switches=len(datapaths), requests=len(users),
+                  mode=args.mode, latency=args.latency, wsgi=args.wsgi, startup_s=startup, rss_mb=rss_mb(),
+                  rss_startup_mb=rss_before, flow_mods=sum(datapath.flow_mods for datapath in datapaths.values()),
+                  outcomes=results[0][1], benchmarks=[results[0][0]] + results[1:])
+
+    print("graph: %d nodes, %d links, %d switches; startup %.3fs; max RSS %.1f MB"
+          % (report['nodes'], report['links'], report['switches'], startup, report['rss_mb']))
+    print("requests: %d (%s), FlowMods: %d, install mode: %s, switch latency: %gs%s"
+          % (len(users), ", ".join("%s %d" % item for item in sorted(report['outcomes'].items())),
+             report['flow_mods'], args.mode, args.latency, ", through WSGI" if args.wsgi else ""))
+    print("%-18s %8s %10s %10s %10s %10s %12s" % ('benchmark', 'count', 'mean ms', 'p50 ms', 'p99 ms', 'max ms',
+                                                  'ops/s'))
+    for bench in report['benchmarks']:
+        print("%-18s %8d %10.3f %10.3f %10.3f %10.3f %12.1f" % (bench['name'], bench['count'], bench['mean_ms'],
+                                                               bench['p50_ms'], bench['p99_ms'], bench['max_ms'],
+                                                               bench['ops_per_s']))
+    if args.json:
+        with open(args.json, 'w') as out:
+            json.dump(report, out, indent=4)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the BQoEPath controller without Mininet')
+    parser.add_argument("traces", nargs='*', help="trace files to replay (default traces/dash-load.csv)")
+    parser.add_argument("--topology", default=Controller_DBR.TOPOLOGY_FILE,
+                        help="Mininet 'net' dump or topology descriptor to route on")
+    parser.add_argument("--regions", type=int, default=0,
+                        help="generate a provider topology with this many metro/access regions instead (see "
+                             "topo_descriptor.generate)")
+    parser.add_argument("--users-per-ran", type=int, default=10)
+    parser.add_argument("--random", type=int, default=0, help="add requests from random users of the topology")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the requests this many times")
+    parser.add_argument("--keep", action="store_true",
+                        help="keep the bandwidth reservations, by default each video is released once admitted")
+    parser.add_argument("--mode", default='barrier', choices=['none', 'barrier', 'bundle'],
+                        help="flow install mode, see FLOW_INSTALL_MODE")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds each stub switch takes to answer")
+    parser.add_argument("--wsgi", action="store_true", help="send adm_weights requests through the REST stack")
+    parser.add_argument("-k", type=int, default=Controller_DBR.MULTIPATH_LEVEL, help="paths per k shortest query")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+    if not args.traces and not args.random:
+        args.traces = ['traces/dash-load.csv']
+
+    logging.basicConfig(level=logging.WARNING)
+    run(args)
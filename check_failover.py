@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+"""
+Fast-failover check: fails every protected link of the installed paths and walks the switch tables to the destination
+
+Videos are admitted for the users of the topology against StubDatapaths, as
+in bench_controller.py. Then, for every installed src-dst pair and every switch
+link its route leaves through a fast-failover group, the link is taken down and the
+packet is followed hop by hop through the flow and group tables of the stubs, a
+bucket being live when its watch port is not on the failed link. Every such
+walk must reach the destination host: a switch seen twice is a loop, a switch
+without a flow for the pair or a dead output is a drop. The flows of the switches
+that are only on a detour must also never idle out, and no switch may have
+rejected a message, e.g. a group added under an id already taken.
+
+    $ python3 check_failover.py
+    $ python3 check_failover.py --regions 3 --users 600
+"""
+from ryu.lib import hub
+
+hub.patch(thread=False)  # as ryu-manager does, the path workers still need real threads
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+
+from ryu.app.wsgi import WSGIApplication
+
+import Controller_DBR
+import stub_datapath
+import topo_descriptor
+
+
+def hop_output(datapath, pair, failed_ports):
+    """
+    Output port of the flow of pair on a stub switch, through its fast-failover group if any
+
+    Returns None when the switch has no flow for the pair or every bucket of the group is down.
+    """
+    ofproto = datapath.ofproto
+    for (table_id, priority, fields), flow in datapath.flows.items():
+        match = dict(fields)
+        if priority != Controller_DBR.PATH_PRIORITY or (match.get('ipv4_src'), match.get('ipv4_dst')) != pair:
+            continue
+        for instruction in flow.instructions:
+            for action in getattr(instruction, 'actions', []):
+                if action.cls_action_type == ofproto.OFPAT_OUTPUT:
+                    return None if action.port in failed_ports else action.port
+                if action.cls_action_type == ofproto.OFPAT_GROUP:
+                    group = datapath.groups.get(action.group_id)
+                    for bucket in group.buckets if group is not None else ():
+                        if bucket.watch_port not in failed_ports:
+                            return bucket.actions[0].port
+                    return None
+    return None
+
+
+def walk(app, datapaths, pair, failed=None):
+    """
+    Follows the packets of pair from the switch of its source, with the link of edge id failed down
+
+    Returns
+    -------
+    tuple
+        ('delivered' | 'loop' | 'drop' | 'misdelivered', [(dpid, edge id sent over), ...])
+    """
+    graph = app.graph
+    names = graph.names
+    failed_ports = {}  # {dpid: ports on the failed link}
+    if failed is not None:
+        a, b = graph.ends[failed]
+        for u, v in ((a, b), (b, a)):
+            dpid = app.registry.dpid.get(names[u])
+            if dpid is not None:
+                failed_ports.setdefault(dpid, set()).add(graph.port(names[u], names[v]))
+    src = app.registry.name_by_ip[pair[0]]
+    dst = app.registry.name_by_ip[pair[1]]
+    node = graph.index[graph.neighbors(src)[0]]
+    hops = []
+    seen = set()
+    while True:
+        dpid = app.registry.dpid.get(names[node])
+        if dpid is None:
+            return ('delivered' if names[node] == dst else 'misdelivered'), hops
+        if dpid in seen:
+            return 'loop', hops
+        seen.add(dpid)
+        port = hop_output(datapaths[dpid], pair, failed_ports.get(dpid, ()))
+        edge = app.port_edges.get((dpid, port))
+        if edge is None:
+            return 'drop', hops
+        hops.append((dpid, edge))
+        a, b = graph.ends[edge]
+        node = b if a == node else a
+
+
+def run(args):
+    random.seed(args.seed)
+    Controller_DBR.SNAPSHOT_FILE = None
+
+    topology = args.topology
+    if args.regions:
+        handle, topology = tempfile.mkstemp(prefix='failover-topology-', suffix='.json')
+        os.close(handle)
+        topo_descriptor.save(topo_descriptor.generate(args.regions, args.users_per_ran), topology)
+    Controller_DBR.TOPOLOGY_FILE = topology
+    app = Controller_DBR.BQoEPathApi(wsgi=WSGIApplication(), dpset=None)
+    datapaths = stub_datapath.attach(app)
+    if args.regions:
+        os.remove(topology)
+
+    users = [name for name in app.graph.names if app.registry.role.get(name) == 'user']
+    random.shuffle(users)
+    for user in users[:args.users]:
+        destinations = list(Controller_DBR.CDN_HOSTS)
+        random.shuffle(destinations)
+        session, path = app.admit_video(user, destinations)
+        if session is not None:
+            app.deploy_any_path(app.registry.humanize(path))
+
+    pairs = set()
+    for flows in app.installed_flows.values():
+        pairs.update(flows)
+    counts = {}
+    failures = [(None, None, "s%d rejected a message: error type %d code %d" % (dpid, error.type, error.code))
+                for dpid, datapath in sorted(datapaths.items()) for error in datapath.errors]
+    for pair in sorted(pairs):
+        for dpid in app.standby_switches.get(pair, ()):
+            if any(flow.idle_timeout for key, flow in datapaths[dpid].flows.items()
+                   if key[1] == Controller_DBR.PATH_PRIORITY and dict(key[2]).get('ipv4_dst') == pair[1]
+                   and dict(key[2]).get('ipv4_src') == pair[0]):
+                failures.append((pair, None, 'detour flow on s%d idles out' % dpid))
+        outcome, route = walk(app, datapaths, pair)
+        if outcome != 'delivered':
+            failures.append((pair, None, outcome))
+            continue
+        for dpid, edge in route:
+            if not isinstance(app.installed_flows.get(dpid, {}).get(pair), tuple):
+                counts['unprotected'] = counts.get('unprotected', 0) + 1
+                continue
+            outcome = walk(app, datapaths, pair, edge)[0]
+            counts[outcome] = counts.get(outcome, 0) + 1
+            if outcome != 'delivered':
+                failures.append((pair, edge, outcome))
+
+    print("graph: %d nodes, %d links; %d pairs installed" % (app.graph.n, app.graph.m, len(pairs)))
+    print("link failures: %s; %d problems" % (", ".join("%s %d" % item for item in sorted(counts.items())),
+                                              len(failures)))
+    for pair, edge, outcome in failures[:args.show]:
+        if pair is None:
+            print(outcome)
+            continue
+        route = "%s -> %s" % (app.registry.name_by_ip[pair[0]], app.registry.name_by_ip[pair[1]])
+        if edge is not None:
+            route += ", %s down" % '-'.join(app.registry.to_human(app.graph.names[u]) for u in app.graph.ends[edge])
+        print("%s: %s" % (route, outcome))
+    return not failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the fast-failover groups of the installed paths')
+    parser.add_argument("--topology", default=Controller_DBR.TOPOLOGY_FILE,
+                        help="Mininet 'net' dump or topology descriptor to route on")
+    parser.add_argument("--regions", type=int, default=0,
+                        help="generate a provider topology with this many metro/access regions instead")
+    parser.add_argument("--users-per-ran", type=int, default=10)
+    parser.add_argument("--users", type=int, default=200, help="users admitted before the links are failed")
+    parser.add_argument("--show", type=int, default=10, help="failures listed")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(0 if run(args) else 1)
@@ -0,0 +1,310 @@
+#!/usr/bin/python3
+"""
+Headless control of a running experiment network: commands in host namespaces through persistent shells
+
+Topo_DBR.py --headless brings the topology up and, instead of the Mininet CLI,
+serves CONTROL_SOCKET. Every host gets one long-lived bash inside its
+namespaces, started on first use, and a command is a single line written to that
+shell, so launching a player costs one message instead of the mininet/util/m
+process chain. The protocol is one JSON object per line in each direction:
+
+    {"op": "run", "host": "u001", "cmd": "bash player_wrapper.sh ...", "notify": true, "id": 7}
+        -> {"id": 7, "job": 12}, then once the command exits -> {"id": 7, "job": 12, "status": 0}
+    {"op": "wait", "job": 12}   -> {"job": 12, "status": 0} once job 12 exits
+    {"op": "hosts"}             -> {"hosts": {"u001": "10.0.0.1", ...}}
+    {"op": "stop"}              -> {"stopping": true}, and the network is torn down
+
+Replies carry the id of their request, so many requests can be in flight on
+one connection; trace_replay.py replays traces through it. From the shell:
+
+    $ sudo python3 Topo_DBR.py --headless &
+    $ sudo python3 host_control.py run u001 'ping -c 1 10.0.0.251'
+    $ sudo python3 trace_replay.py traces/dash-load.csv out_test.csv
+    $ sudo python3 host_control.py stop
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import threading
+from subprocess import PIPE, STDOUT
+
+CONTROL_SOCKET = '/tmp/bqoe-topology.sock'
+EXIT_MARKER = 'bqoe-job-exit'
+
+
+def shell_quote(text):
+    return "'" + text.replace("'", "'\\''") + "'"
+
+
+class HostShell(object):
+    """ Persistent bash in the namespaces of a Mininet host
+
+        Each command runs in the background of the shell, its output discarded,
+        and the shell prints EXIT_MARKER, the job and the exit status when it is
+        done; a reader thread hands them to on_exit(job, status).
+    """
+
+    def __init__(self, node, on_exit):
+        self.node = node
+        self.on_exit = on_exit
+        self.lock = threading.Lock()
+        self.process = node.popen(['bash', '--norc', '--noprofile', '-s'], stdin=PIPE, stdout=PIPE, stderr=STDOUT,
+                                  universal_newlines=True, cwd=os.getcwd())
+        self.reader = threading.Thread(target=self.read_exits, name='shell-%s' % node.name)
+        self.reader.daemon = True
+        self.reader.start()
+
+    def run(self, job, command):
+        line = '{ ( eval %s ) < /dev/null > /dev/null 2>&1; echo "%s %d $?"; } &\n' % (shell_quote(command),
+                                                                                      EXIT_MARKER, job)
+        with self.lock:
+            self.process.stdin.write(line)
+            self.process.stdin.flush()
+
+    def read_exits(self):
+        for line in self.process.stdout:
+            fields = line.split()
+            if len(fields) == 3 and fields[0] == EXIT_MARKER:
+                self.on_exit(int(fields[1]), int(fields[2]))
+            else:
+                logging.debug("%s: %s", self.node.name, line.rstrip())
+
+    def close(self):
+        """ Kills the shell and every command still running in it
+        """
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)  # mnexec -d made the shell a process group leader
+        except OSError:
+            pass
+        self.process.wait()
+
+
+class Experiment(object):
+    """ Python API of a headless network: runs commands on its hosts and serves them on a control socket
+
+        Parameters
+        ----------
+        net : mininet.net.Mininet
+            the started network
+    """
+
+    def __init__(self, net):
+        self.net = net
+        self.shells = {}  # {host name: HostShell}
+        self.job_ids = itertools.count(1)
+        self.status = {}  # {job: exit status, None while running}
+        self.listeners = {}  # {job: [callback(job, status), ...]}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.server = None
+
+    def shell(self, host):
+        with self.lock:
+            shell = self.shells.get(host)
+            if shell is None:
+                shell = self.shells[host] = HostShell(self.net[host], self.job_exited)
+            return shell
+
+    def run(self, host, command, on_exit=None):
+        """ Runs command in the namespaces of host without waiting for it
+
+            Returns
+            -------
+            int
+                the job, on_exit(job, status) is called from another thread when it exits
+        """
+        shell = self.shell(host)
+        job = next(self.job_ids)
+        with self.lock:
+            self.status[job] = None
+            if on_exit is not None:
+                self.listeners[job] = [on_exit]
+        shell.run(job, command)
+        return job
+
+    def add_listener(self, job, on_exit):
+        """ Calls on_exit(job, status) once job exits, right away if it already has
+        """
+        with self.lock:
+            status = self.status[job]
+            if status is None:
+                self.listeners.setdefault(job, []).append(on_exit)
+                return
+        on_exit(job, status)
+
+    def wait(self, job, timeout=None):
+        """ Exit status of job, None if it is still running after timeout seconds
+        """
+        done = threading.Event()
+        self.add_listener(job, lambda *args: done.set())
+        done.wait(timeout)
+        return self.status[job]
+
+    def job_exited(self, job, status):
+        with self.lock:
+            self.status[job] = status
+            listeners = self.listeners.pop(job, [])
+        for on_exit in listeners:
+            on_exit(job, status)
+
+    def running(self):
+        with self.lock:
+            return [job for job, status in self.status.items() if status is None]
+
+    def serve(self, path=CONTROL_SOCKET):
+        """ Serves the control socket from a background thread
+        """
+        if os.path.exists(path):
+            os.remove(path)
+        self.server = ControlServer(path, self)
+        thread = threading.Thread(target=self.server.serve_forever, name='control-socket')
+        thread.daemon = True
+        thread.start()
+        logging.info("control socket on %s", path)
+
+    def stop(self):
+        self.stopped.set()
+
+    def close(self):
+        """ Stops serving and kills every shell, and the commands still running in them
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            if os.path.exists(self.server.server_address):
+                os.remove(self.server.server_address)
+            self.server = None
+        with self.lock:
+            shells, self.shells = list(self.shells.values()), {}
+        for shell in shells:
+            shell.close()
+
+
+class ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, experiment):
+        self.experiment = experiment
+        socketserver.UnixStreamServer.__init__(self, path, ControlHandler)
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    """ One connection to the control socket, see the module docstring for the protocol
+    """
+
+    def setup(self):
+        socketserver.StreamRequestHandler.setup(self)
+        self.write_lock = threading.Lock()
+
+    def send(self, message):
+        data = (json.dumps(message) + '\n').encode()
+        with self.write_lock:
+            try:
+                self.wfile.write(data)
+                self.wfile.flush()
+            except (OSError, ValueError):
+                pass  # the client went away, its notifications are dropped
+
+    def handle(self):
+        experiment = self.server.experiment
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            request = None
+            try:
+                request = json.loads(line.decode())
+                self.dispatch(experiment, request)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                self.send(dict(id=request.get('id') if isinstance(request, dict) else None, error=str(e)))
+
+    def dispatch(self, experiment, request):
+        op = request['op']
+        request_id = request.get('id')
+
+        def exited(job, status):
+            self.send(dict(id=request_id, job=job, status=status))
+
+        if op == 'run':
+            job = experiment.run(request['host'], request['cmd'], exited if request.get('notify') else None)
+            self.send(dict(id=request_id, job=job))
+        elif op == 'wait':
+            experiment.add_listener(int(request['job']), exited)
+        elif op == 'hosts':
+            self.send(dict(id=request_id, hosts=dict((host.name, host.IP()) for host in experiment.net.hosts)))
+        elif op == 'stop':
+            self.send(dict(id=request_id, stopping=True))
+            experiment.stop()
+        else:
+            raise ValueError("unknown op %s" % op)
+
+
+class ControlClient(object):
+    """ Blocking client of the control socket, one request at a time
+    """
+
+    def __init__(self, path=CONTROL_SOCKET):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.file = self.socket.makefile('rw')
+
+    def request(self, op, **fields):
+        fields['op'] = op
+        self.file.write(json.dumps(fields) + '\n')
+        self.file.flush()
+        return self.reply()
+
+    def reply(self):
+        line = self.file.readline()
+        if not line:
+            raise EOFError("control socket closed")
+        message = json.loads(line)
+        if 'error' in message:
+            raise ValueError(message['error'])
+        return message
+
+    def run(self, host, command, wait=False):
+        """ Job of command on host, or its exit status when wait is set
+        """
+        job = self.request('run', host=host, cmd=command, notify=wait)['job']
+        return self.reply()['status'] if wait else job
+
+    def hosts(self):
+        return self.request('hosts')['hosts']
+
+    def stop(self):
+        return self.request('stop')
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Drive a headless Topo_DBR.py network through its control socket')
+    parser.add_argument("--socket", default=CONTROL_SOCKET)
+    commands = parser.add_subparsers(dest='command')
+    runner = commands.add_parser('run', help="run a command on a host and print its exit status")
+    runner.add_argument("host")
+    runner.add_argument("cmd")
+    runner.add_argument("--background", action="store_true", help="print the job instead of waiting for it")
+    commands.add_parser('hosts', help="list the hosts and their addresses")
+    commands.add_parser('stop', help="tear the network down")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    client = ControlClient(args.socket)
+    if args.command == 'run':
+        print(client.run(args.host, args.cmd, wait=not args.background))
+    elif args.command == 'hosts':
+        for name, ip in sorted(client.hosts().items()):
+            print("%s %s" % (name, ip))
+    elif args.command == 'stop':
+        client.stop()
+    else:
+        parser.print_help()
+    client.close()
@@ -0,0 +1,205 @@
+"""
+In-process stand-in for the OpenFlow datapaths of BQoEPathApi
+
+Lets the controller run without Mininet or OVS: every message sent to a
+StubDatapath is serialized as Ryu would before writing it to the socket, counted
+and applied to an in-memory flow and group table, and the requests a switch answers
+(barriers, flow stats, group descriptions) are answered through the controller's own handlers,
+optionally after an artificial per-switch latency. A GroupMod OVS would reject
+is answered with an error message instead.
+"""
+import time
+
+from ryu.controller import ofp_event
+from ryu.lib import hub
+from ryu.ofproto import ofproto_v1_3, ofproto_v1_3_parser
+
+parser = ofproto_v1_3_parser
+
+
+class StubDatapath(object):
+    """
+    Fake datapath with the interface BQoEPathApi uses: id, ofproto, ofproto_parser, set_xid and send_msg
+
+    Parameters
+    ----------
+    dpid : int
+        datapath id
+    app : BQoEPathApi
+        controller whose handlers receive the replies, None leaves requests unanswered
+    record : bool
+        keep every message sent in self.sent
+    latency : float
+        seconds the switch takes to answer a request, the reply is delivered from
+        another green thread so barriers of several switches are awaited in parallel
+    """
+
+    def __init__(self, dpid, app=None, record=False, latency=0.0):
+        self.id = dpid
+        self.app = app
+        self.ofproto = ofproto_v1_3
+        self.ofproto_parser = ofproto_v1_3_parser
+        self.xid = 0
+        self.record = record
+        self.latency = latency
+        self.sent = []  # messages received, when recording
+        self.counts = {}  # {message class name: messages received}
+        self.bytes = 0  # wire size of the messages received
+        self.flow_mods = 0  # FlowMods applied, directly or through a bundle
+        self.flows = {}  # {(table_id, priority, match fields): OFPFlowMod} the switch flow table
+        self.groups = {}  # {group_id: OFPGroupMod} the switch group table
+        self.errors = []  # OFPErrorMsg sent back for the messages rejected
+        self.bundles = {}  # {bundle_id: [msg, ...]} open bundles
+        self.started = time.time()
+
+    def set_xid(self, msg):
+        self.xid += 1
+        self.xid &= self.ofproto.MAX_XID
+        msg.set_xid(self.xid)
+        return self.xid
+
+    def send_msg(self, msg):
+        if msg.xid is None:
+            self.set_xid(msg)
+        msg.serialize()
+        self.bytes += len(msg.buf)
+        name = msg.__class__.__name__
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if self.record:
+            self.sent.append(msg)
+
+        if isinstance(msg, parser.OFPFlowMod):
+            self.apply_flow_mod(msg)
+        elif isinstance(msg, parser.OFPGroupMod):
+            code = self.apply_group_mod(msg)
+            if code is not None:
+                self.error(msg, self.ofproto.OFPET_GROUP_MOD_FAILED, code)
+        elif isinstance(msg, parser.ONFBundleAddMsg):
+            self.bundles.setdefault(msg.bundle_id, []).append(msg.message)
+        elif isinstance(msg, parser.ONFBundleCtrlMsg):
+            if msg.type == self.ofproto.ONF_BCT_OPEN_REQUEST:
+                self.bundles[msg.bundle_id] = []
+            elif msg.type == self.ofproto.ONF_BCT_COMMIT_REQUEST:
+                for bundled in self.bundles.pop(msg.bundle_id, []):
+                    self.apply_flow_mod(bundled)
+            elif msg.type == self.ofproto.ONF_BCT_DISCARD_REQUEST:
+                self.bundles.pop(msg.bundle_id, None)
+        elif isinstance(msg, parser.OFPBarrierRequest):
+            reply = parser.OFPBarrierReply(self)
+            reply.xid = msg.xid
+            self.reply('barrier_reply_handler', ofp_event.EventOFPBarrierReply(reply))
+        elif isinstance(msg, parser.OFPFlowStatsRequest):
+            reply = parser.OFPFlowStatsReply(self)
+            reply.xid = msg.xid
+            reply.flags = 0
+            reply.body = self.flow_stats()
+            self.reply('flow_stats_reply_handler', ofp_event.EventOFPFlowStatsReply(reply))
+        elif isinstance(msg, parser.OFPGroupDescStatsRequest):
+            reply = parser.OFPGroupDescStatsReply(self)
+            reply.xid = msg.xid
+            reply.flags = 0
+            reply.body = [parser.OFPGroupDescStats(group.type, group.group_id, group.buckets)
+                          for group in self.groups.values()]
+            self.reply('group_desc_stats_reply_handler', ofp_event.EventOFPGroupDescStatsReply(reply))
+
+    def error(self, msg, type_, code):
+        """
+        Rejects msg, the error carries its first 64 bytes as OpenFlow requires
+        """
+        reply = parser.OFPErrorMsg(self, type_=type_, code=code, data=bytes(msg.buf[:64]))
+        reply.xid = msg.xid
+        self.errors.append(reply)
+        self.reply('error_msg_handler', ofp_event.EventOFPErrorMsg(reply))
+
+    def reply(self, handler, ev):
+        if self.app is None:
+            return
+        if self.latency:
+            hub.spawn_after(self.latency, getattr(self.app, handler), ev)
+        else:
+            getattr(self.app, handler)(ev)
+
+    @staticmethod
+    def flow_key(msg):
+        return msg.table_id, msg.priority, tuple(sorted(msg.match.items()))
+
+    def apply_flow_mod(self, msg):
+        """
+        Applies a FlowMod to the flow table, as OpenFlow 1.3 defines each command
+        """
+        ofproto = self.ofproto
+        self.flow_mods += 1
+        if msg.command in (ofproto.OFPFC_ADD, ofproto.OFPFC_MODIFY, ofproto.OFPFC_MODIFY_STRICT):
+            self.flows[self.flow_key(msg)] = msg
+        elif msg.command == ofproto.OFPFC_DELETE_STRICT:
+            self.flows.pop(self.flow_key(msg), None)
+        elif msg.command == ofproto.OFPFC_DELETE:
+            fields = set(msg.match.items())
+            for key, flow in list(self.flows.items()):
+                if msg.table_id not in (ofproto.OFPTT_ALL, key[0]):
+                    continue
+                if (flow.cookie & msg.cookie_mask) != (msg.cookie & msg.cookie_mask):
+                    continue
+                if fields <= set(key[2]):
+                    del self.flows[key]
+
+    def apply_group_mod(self, msg):
+        """
+        Applies a GroupMod to the group table, deleting a group also deletes the flows using it
+
+        Returns the OFPGMFC error code of a rejected GroupMod, adding an existing group or
+        modifying a missing one, None when it was applied.
+        """
+        ofproto = self.ofproto
+        if msg.command == ofproto.OFPGC_ADD and msg.group_id in self.groups:
+            return ofproto.OFPGMFC_GROUP_EXISTS
+        if msg.command == ofproto.OFPGC_MODIFY and msg.group_id not in self.groups:
+            return ofproto.OFPGMFC_UNKNOWN_GROUP
+        if msg.command in (ofproto.OFPGC_ADD, ofproto.OFPGC_MODIFY):
+            self.groups[msg.group_id] = msg
+        elif msg.command == ofproto.OFPGC_DELETE:
+            deleted = set(self.groups) if msg.group_id == ofproto.OFPG_ALL else {msg.group_id}
+            for group_id in deleted:
+                self.groups.pop(group_id, None)
+            for key, flow in list(self.flows.items()):
+                if any(getattr(action, 'group_id', None) in deleted for instruction in flow.instructions
+                       for action in getattr(instruction, 'actions', [])):
+                    del self.flows[key]
+
+    def flow_stats(self):
+        """
+        OFPFlowStats of every entry of the flow table
+        """
+        elapsed = time.time() - self.started
+        return [parser.OFPFlowStats(table_id=flow.table_id, duration_sec=int(elapsed),
+                                    duration_nsec=int((elapsed % 1) * 1e9), priority=flow.priority,
+                                    idle_timeout=flow.idle_timeout, hard_timeout=flow.hard_timeout, flags=flow.flags,
+                                    cookie=flow.cookie, packet_count=0, byte_count=0, match=flow.match,
+                                    instructions=flow.instructions)
+                for flow in self.flows.values()]
+
+
+def attach(app, dpids=None, record=False, latency=0.0):
+    """
+    Connects a StubDatapath for every switch of app (or only dpids), going through switch_features_handler
+
+    Parameters
+    ----------
+    latency : float or dict
+        answer latency of every switch, or {dpid: latency}
+
+    Returns
+    -------
+    dict
+        {dpid: StubDatapath}
+    """
+    if dpids is None:
+        dpids = sorted(app.registry.name_by_dpid)
+    datapaths = {}
+    for dpid in dpids:
+        delay = latency.get(dpid, 0.0) if isinstance(latency, dict) else latency
+        datapath = datapaths[dpid] = StubDatapath(dpid, app, record, delay)
+        features = parser.OFPSwitchFeatures(datapath, datapath_id=dpid, n_buffers=0, n_tables=254,
+                                            auxiliary_id=0, capabilities=0)
+        app.switch_features_handler(ofp_event.EventOFPSwitchFeatures(features))
+    return datapaths
@@ -0,0 +1,291 @@
+#!/usr/bin/python3
+"""
+Topology descriptors: the experiment network as a JSON document, its generator and its exporter
+
+A descriptor lists the switches, the hosts (name, ip, mac) and the links (node1,
+port1, node2, port2, the name of a link profile with the TCLink parameters, and
+whether the host is the aux host of its switch). Topo_DBR.py builds the Mininet
+network from it, and net_dump writes the Mininet 'net' dump that
+BQoEPathApi.parse_graph reads, so both sides always see the same topology.
+
+    $ python3 topo_descriptor.py generate --regions 4 --users-per-ran 50 -o topologies/large.json
+    $ python3 topo_descriptor.py export topologies/large.json -o topology.txt
+    $ sudo python3 Topo_DBR.py --topology topologies/large.json
+"""
+import argparse
+import itertools
+import json
+import socket
+import struct
+
+DEFAULT_DESCRIPTOR = 'topologies/infocom2018.json'  # the hand-written topology of the experiments
+
+RANS_PER_METRO = 4
+METROS = 5
+ACCESS = 4
+CORES = 4
+
+# Switch naming plan, as Controller_DBR.SWITCH_ROLES: the aux host of switch s21 is m1, and so on
+SWITCH_NAMES = [
+    ('r', 1, 20),
+    ('m', 21, 25),
+    ('a', 26, 29),
+    ('c', 30, 33),
+    ('i', 34, 34),
+]
+# Addressing, as Controller_DBR.NodeRegistry: users take USER_NET + <number>, the aux hosts
+# 10.0.0.<SWITCH_IP_BASE + dpid>
+HOST_IPS = {
+    "cdn1": "10.0.0.251",
+    "cdn2": "10.0.0.252",
+    "cdn3": "10.0.0.253",
+    "ext1": "10.0.0.254",
+}
+USER_NET = "10.0.0.0"
+SWITCH_IP_BASE = 200
+# user numbers whose address would fall among the switch and fixed host addresses are skipped
+RESERVED_USERS = (SWITCH_IP_BASE + 1, 255)
+
+# TCLink parameters of every tier of a generated topology, close to the experiment topology
+GENERATED_PROFILES = {
+    'ran_metro': {'bw': 20, 'delay': '6ms'},
+    'metro_ring': {'bw': 20, 'delay': '8ms'},
+    'metro_cdn': {'bw': 20, 'delay': '1ms'},
+    'metro_access': {'bw': 200, 'delay': '25ms'},
+    'access_ring': {'bw': 200, 'delay': '20ms'},
+    'access_core': {'bw': 200, 'delay': '20ms'},
+    'core_mesh': {'bw': 200, 'delay': '20ms'},
+    'core_internet': {'bw': 200, 'delay': '25ms'},
+    'cdn': {'bw': 200, 'delay': '1ms'},
+    'internet': {'bw': 200, 'delay': '30ms'},
+}
+
+
+def load(path):
+    with open(path) as descriptor:
+        return json.load(descriptor)
+
+
+def save(descriptor, path):
+    """
+    Writes a descriptor with one host or link per line, so it stays readable and diffable
+    """
+    lines = ['{']
+    for key in ('name', 'controller'):
+        lines.append('    %s: %s,' % (json.dumps(key), json.dumps(descriptor[key], sort_keys=True)))
+    profiles = ['%s: %s' % (json.dumps(name), json.dumps(profile, sort_keys=True))
+                for name, profile in sorted(descriptor['link_profiles'].items())]
+    lines.append('    "link_profiles": {\n        %s\n    },' % ',\n        '.join(profiles))
+    lines.append('    "switches": %s,' % json.dumps(descriptor['switches']))
+    for key in ('hosts', 'links'):
+        items = [json.dumps(item, sort_keys=True) for item in descriptor[key]]
+        lines.append('    %s: [\n        %s\n    ]%s' % (json.dumps(key), ',\n        '.join(items),
+                                                       ',' if key == 'hosts' else ''))
+    lines.append('}')
+    with open(path, 'w') as out:
+        out.write('\n'.join(lines) + '\n')
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(struct.pack('!I', value))
+
+
+def ip_to_int(ip):
+    return struct.unpack('!I', socket.inet_aton(ip))[0]
+
+
+def mac_of(ip):
+    return '00:04:%02X:%02X:%02X:%02X' % tuple(bytearray(socket.inet_aton(ip)))
+
+
+def aux_name(dpid):
+    """
+    Name of the aux host of a switch, None for switches outside the naming plan
+    """
+    for prefix, first, last in SWITCH_NAMES:
+        if first <= dpid <= last:
+            return "%s%d" % (prefix, dpid - first + 1)
+    return None
+
+
+def user_numbers():
+    """
+    User numbers in order, skipping those whose address is taken by switches and fixed hosts
+    """
+    for number in itertools.count(1):
+        if not RESERVED_USERS[0] <= number <= RESERVED_USERS[1]:
+            yield number
+
+
+def generate(regions=1, users_per_ran=10, rans_per_metro=RANS_PER_METRO, metros=METROS, access=ACCESS,
+             cores=CORES):
+    """
+    Descriptor of a provider topology with the given number of metro/access regions
+
+    Every region has a metro ring of RAN switches with their users and an access
+    ring, all regions hang from the same full-mesh core, which reaches the
+    Internet switch. With the default sizes region 0 has the switches, users and
+    CDNs of the experiment topology; link delays are uniform per tier.
+
+    Parameters
+    ----------
+    regions : int
+        metro/access regions
+    users_per_ran : int
+        users attached to every RAN switch
+    rans_per_metro, metros, access, cores : int
+        RAN switches per metro switch, metro and access switches per region, core switches
+
+    Returns
+    -------
+    dict
+        the descriptor
+    """
+    switches = []
+    hosts = []
+    links = []
+    next_port = {}
+
+    def port(switch):
+        number = next_port.get(switch, 1)
+        next_port[switch] = number + 1
+        return number
+
+    def add_switch(dpid):
+        name = "s%d" % dpid
+        switches.append(name)
+        return name
+
+    def add_host(name, ip, switch, profile=None, aux=False):
+        hosts.append(dict(name=name, ip=ip, mac=mac_of(ip)))
+        link = dict(node1=name, port1=0, node2=switch, port2=port(switch))
+        if profile is not None:
+            link['profile'] = profile
+        if aux:
+            link['aux'] = True
+        links.append(link)
+
+    def connect(a, b, profile):
+        links.append(dict(node1=a, port1=port(a), node2=b, port2=port(b), profile=profile))
+
+    region_size = rans_per_metro * metros + metros + access
+    base_core = region_size + 1
+    first_dpids = [1] + [base_core + cores + 1 + region * region_size for region in range(regions - 1)]
+    core_switches = [add_switch(base_core + i) for i in range(cores)]
+    internet = add_switch(base_core + cores)
+
+    users = user_numbers()
+    for region, first in enumerate(first_dpids):
+        dpids = range(first, first + region_size)
+        ran_switches = [add_switch(dpid) for dpid in dpids[:rans_per_metro * metros]]
+        metro_switches = [add_switch(dpid) for dpid in dpids[rans_per_metro * metros:-access]]
+        access_switches = [add_switch(dpid) for dpid in dpids[-access:]]
+
+        for i, ran in enumerate(ran_switches):
+            for _ in range(users_per_ran):
+                number = next(users)
+                add_host("u%03d" % number, int_to_ip(ip_to_int(USER_NET) + number), ran)
+            connect(ran, metro_switches[i // rans_per_metro], 'ran_metro')
+        for ring, profile in ((metro_switches, 'metro_ring'), (access_switches, 'access_ring')):
+            for i in range(len(ring)):
+                connect(ring[i], ring[(i + 1) % len(ring)], profile)
+        for i in range(1, min(metros, access) - 1):
+            connect(metro_switches[i], access_switches[i], 'metro_access')
+        for i, switch in enumerate(access_switches):
+            connect(switch, core_switches[(i // 2) % cores], 'access_core')
+        if region == 0:
+            add_host('cdn1', HOST_IPS['cdn1'], metro_switches[-1], 'metro_cdn')
+            add_host('cdn2', HOST_IPS['cdn2'], access_switches[-1], 'cdn')
+
+    for i in range(cores):
+        for j in range(i + 1, cores):
+            connect(core_switches[i], core_switches[j], 'core_mesh')
+    for switch in core_switches[-2:]:
+        connect(switch, internet, 'core_internet')
+    add_host('cdn3', HOST_IPS['cdn3'], core_switches[min(1, cores - 1)], 'cdn')
+    add_host('ext1', HOST_IPS['ext1'], internet, 'internet')
+
+    for switch in sorted(switches, key=lambda name: int(name[1:])):
+        dpid = int(switch[1:])
+        name = aux_name(dpid)
+        if name is not None:
+            add_host(name, "10.0.0.%d" % (SWITCH_IP_BASE + dpid), switch, aux=True)
+
+    switches.sort(key=lambda name: int(name[1:]))
+    return dict(name="generated-%dx%d" % (regions, users_per_ran),
+                controller=dict(ip='127.0.0.1', port=6633),
+                link_profiles=GENERATED_PROFILES, switches=switches, hosts=hosts, links=links)
+
+
+def net_dump(descriptor):
+    """
+    The Mininet 'net' dump of a descriptor, as parsed by BQoEPathApi.parse_graph (topology.txt)
+
+    Returns
+    -------
+    list
+        one line per host, then one per switch, then the controller
+    """
+    interfaces = dict((name, []) for name in descriptor['switches'])
+    host_lines = dict((host['name'], host['name']) for host in descriptor['hosts'])
+    for link in descriptor['links']:
+        a, port_a, b, port_b = link['node1'], link['port1'], link['node2'], link['port2']
+        for u, port_u, v, port_v in ((a, port_a, b, port_b), (b, port_b, a, port_a)):
+            interface = "%s-eth%d:%s-eth%d" % (u, port_u, v, port_v)
+            if u in interfaces:
+                interfaces[u].append((port_u, interface))
+            else:
+                host_lines[u] += " " + interface
+
+    lines = [host_lines[host['name']] for host in descriptor['hosts']]
+    for name in descriptor['switches']:
+        lines.append("%s lo:  %s" % (name, " ".join(interface for port, interface in sorted(interfaces[name]))))
+    lines.append(descriptor.get('controller', {}).get('name', 'c0'))
+    return lines
+
+
+def link_capacities(descriptor):
+    """
+    Shaped capacity (bps) of every link whose profile sets a TCLink bw (Mbps)
+
+    Returns
+    -------
+    dict
+        {(node1, node2): bps} as the nodes are named in the descriptor
+    """
+    profiles = descriptor['link_profiles']
+    return dict(((link['node1'], link['node2']), profiles[link['profile']]['bw'] * 1e6)
+                for link in descriptor['links'] if 'bw' in profiles.get(link.get('profile'), {}))
+
+
+def export(descriptor, path):
+    """
+    Writes the 'net' dump of a descriptor to path
+    """
+    with open(path, 'w') as dump:
+        dump.write("\n".join(net_dump(descriptor)) + "\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate topology descriptors and export them for the controller')
+    commands = parser.add_subparsers(dest='command')
+    generator = commands.add_parser('generate', help="write the descriptor of a generated provider topology")
+    generator.add_argument("--regions", type=int, default=1, help="metro/access regions")
+    generator.add_argument("--users-per-ran", type=int, default=10)
+    generator.add_argument("--rans-per-metro", type=int, default=RANS_PER_METRO)
+    generator.add_argument("--metros", type=int, default=METROS, help="metro switches per region")
+    generator.add_argument("--access", type=int, default=ACCESS, help="access switches per region")
+    generator.add_argument("--cores", type=int, default=CORES)
+    generator.add_argument("-o", "--output", required=True)
+    exporter = commands.add_parser('export', help="write the Mininet 'net' dump of a descriptor")
+    exporter.add_argument("descriptor", nargs='?', default=DEFAULT_DESCRIPTOR)
+    exporter.add_argument("-o", "--output", default='topology.txt')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        save(generate(args.regions, args.users_per_ran, args.rans_per_metro, args.metros, args.access, args.cores),
+             args.output)
+    elif args.command == 'export':
+        export(load(args.descriptor), args.output)
+    else:
+        parser.print_help()
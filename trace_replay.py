@@ -0,0 +1,386 @@
+#!/usr/bin/python3
+"""
+Trace replay: plays the videos of a trace on a headless network on schedule, and reports how late they started
+
+Every line of a trace (user;quality;sleep;...) is an arrival at the sum of the
+sleeps before it, measured from one start time, so a late arrival does not push
+back the ones after it as the sleeps of video_launcher.sh do. Arrivals sharing a
+deadline are admitted with one POST /bqoepath/admit over a pool of keep-alive
+connections to the controller, the players are launched through the control
+socket of Topo_DBR.py --headless (host_control.py) without waiting for each
+other, and each video is released when its player exits.
+
+    $ sudo python3 Topo_DBR.py --headless &
+    $ sudo python3 trace_replay.py traces/dash-load.csv out_test.csv --json replay.json
+
+The report gives, in milliseconds, how late the arrivals fired and how late
+their players were running after their scheduled time.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import time
+import uuid
+
+import host_control
+
+CONTROLLER_HOST = '127.0.0.1'
+CONTROLLER_PORT = 8080  # ryu-manager WSGI port
+HTTP_CONNECTIONS = 4  # keep-alive connections to the controller
+START_DELAY = 0.5  # seconds between the start and the first arrival
+DENIED_VIDEOS = 'denied_videos.csv'
+# video played for each quality of a trace line: (video id, segments, factor) as passed to player_wrapper.sh
+PLAYER_VIDEOS = {
+    0: ('muse', 32, 5),  # 5 min
+    1: ('ny', 119, 20),  # 20 min
+    2: ('gt', 241, 40),  # 40 min
+}
+
+
+class Arrival(object):
+    """ A video of the trace, with its schedule and, once replayed, what happened to it
+
+        Times are seconds from the start of the replay, None until reached.
+    """
+
+    def __init__(self, user, quality, offset):
+        self.user = user
+        self.quality = quality
+        self.offset = offset  # scheduled arrival
+        self.uuid = str(uuid.uuid4())
+        self.fired = None  # admission request sent
+        self.launched = None  # player running on the host
+        self.exited = None
+        self.outcome = None  # ADMITTED, or why the video was not played (NO_ROUTE, BUSY, ...)
+        self.session = None
+        self.status = None  # exit status of the player
+
+    def as_dict(self):
+        return dict((name, getattr(self, name)) for name in ('user', 'quality', 'offset', 'uuid', 'fired', 'launched',
+                                                            'exited', 'outcome', 'session', 'status'))
+
+
+def read_trace(path):
+    """ Arrivals of a trace file, one per line (user;quality;sleep;...)
+    """
+    arrivals = []
+    offset = 0.0
+    with open(path) as trace:
+        for line in trace:
+            if not line.strip():
+                continue
+            fields = line.strip().split(';')
+            arrivals.append(Arrival(fields[0], int(fields[1]), offset))
+            offset += float(fields[2])
+    return arrivals
+
+
+class HttpPool(object):
+    """ Keep-alive HTTP/1.1 connections to the controller REST API, at most size requests at once
+    """
+
+    def __init__(self, host=CONTROLLER_HOST, port=CONTROLLER_PORT, size=HTTP_CONNECTIONS):
+        self.host = host
+        self.port = port
+        self.idle = []  # [(reader, writer)] open connections waiting for a request
+        self.slots = asyncio.Semaphore(size)
+        self.opened = 0
+
+    async def call(self, method, name, body=None):
+        """ (HTTP status, decoded JSON answer) of /bqoepath/<name>
+
+            A request on a reused connection the controller closed in the meantime is retried once on a new one.
+        """
+        async with self.slots:
+            while True:
+                reused = bool(self.idle)
+                if reused:
+                    reader, writer = self.idle.pop()
+                else:
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+                    self.opened += 1
+                try:
+                    status, keep_alive, answer = await self.exchange(reader, writer, method, name, body)
+                except (OSError, EOFError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if reused:
+                        continue
+                    raise
+                if keep_alive:
+                    self.idle.append((reader, writer))
+                else:
+                    writer.close()
+                return status, answer
+
+    async def exchange(self, reader, writer, method, name, body):
+        data = json.dumps(body).encode() if body is not None else b''
+        head = '%s /bqoepath/%s HTTP/1.1\r\nHost: %s:%d\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n'
+        writer.write((head % (method, name, self.host, self.port, len(data))).encode() + data)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise EOFError("connection closed by the controller")
+        version, status = status_line.split()[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip().lower()
+        keep_alive = version == b'HTTP/1.1' and headers.get('connection') != 'close'
+        if 'content-length' in headers:
+            payload = await reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                chunks.append(await reader.readexactly(size + 2))
+                if not size:
+                    break
+            payload = b''.join(chunk[:-2] for chunk in chunks)
+        else:
+            payload = await reader.read()
+            keep_alive = False
+        try:
+            answer = json.loads(payload.decode() or 'null')
+        except ValueError:
+            answer = None
+        return int(status), keep_alive, answer
+
+    async def wait_ready(self, interval=0.5):
+        """ Polls the readiness probe until every switch is connected and reconciled
+        """
+        while True:
+            try:
+                if (await self.call('GET', 'ready'))[0] == 200:
+                    return
+            except (OSError, EOFError, asyncio.IncompleteReadError):
+                pass
+            await asyncio.sleep(interval)
+
+    def close(self):
+        for reader, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+
+class HostLauncher(object):
+    """ Asynchronous client of the control socket of a headless network, many launches in flight at once
+    """
+
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.ids = itertools.count(1)
+        self.pending = {}  # {request id: (launched future, exited future)}
+        self.receiver = None
+
+    async def connect(self, path=host_control.CONTROL_SOCKET):
+        self.reader, self.writer = await asyncio.open_unix_connection(path)
+        self.receiver = asyncio.ensure_future(self.receive())
+
+    async def receive(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            message = json.loads(line.decode())
+            futures = self.pending.get(message.get('id'))
+            if futures is None:
+                continue
+            launched, exited = futures
+            if 'error' in message:
+                del self.pending[message['id']]
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(ValueError(message['error']))
+            elif 'status' in message:
+                del self.pending[message['id']]
+                exited.set_result(message['status'])
+            else:
+                launched.set_result(message['job'])
+        for futures in self.pending.values():
+            for future in futures:
+                if not future.done():
+                    future.set_exception(EOFError("control socket closed"))
+        self.pending = {}
+
+    async def run(self, host, command):
+        """ Launches command on host, returns once it runs with a future of its exit status
+        """
+        loop = asyncio.get_event_loop()
+        request_id = next(self.ids)
+        launched, exited = self.pending[request_id] = (loop.create_future(), loop.create_future())
+        request = dict(op='run', host=host, cmd=command, notify=True, id=request_id)
+        self.writer.write((json.dumps(request) + '\n').encode())
+        await self.writer.drain()
+        await launched
+        return exited
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.receiver is not None:
+            self.receiver.cancel()
+
+
+def player_command(arrival, answer, log_path):
+    video, segments, factor = PLAYER_VIDEOS[arrival.quality]
+    return 'bash player_wrapper.sh %s %s %s %s %s %s %d %d' % (answer['dest_ip'], arrival.uuid, arrival.user,
+                                                              answer['dst'], log_path, video, segments, factor)
+
+
+async def play(arrivals, log_path, pool, launcher, clock):
+    """ Admits arrivals sharing a deadline with one request, plays the admitted videos and releases them
+    """
+    videos = [dict(src=arrival.user, dst='all', video_id=PLAYER_VIDEOS[arrival.quality][0], uuid=arrival.uuid)
+              for arrival in arrivals]
+    try:
+        status, answers = await pool.call('POST', 'admit', videos)
+    except (OSError, EOFError, asyncio.IncompleteReadError) as e:
+        status, answers = None, dict(path='UNREACHABLE: %s' % e)
+    if status != 200 or not isinstance(answers, list):
+        answers = [answers if isinstance(answers, dict) else dict(path='HTTP %s' % status)] * len(arrivals)
+
+    launches = []
+    for arrival, answer in zip(arrivals, answers):
+        if 'session' not in answer:
+            arrival.outcome = answer.get('path', answer.get('error'))
+            logging.info("%s: %s", arrival.user, arrival.outcome)
+            if arrival.outcome == 'NO_ROUTE':
+                with open(DENIED_VIDEOS, 'a') as denied:
+                    denied.write('%d;%s\n' % (time.time(), arrival.user))
+            continue
+        arrival.outcome = 'ADMITTED'
+        arrival.session = answer['session']
+        launches.append(launch(arrival, answer, log_path, pool, launcher, clock))
+    await asyncio.gather(*launches)
+
+
+async def launch(arrival, answer, log_path, pool, launcher, clock):
+    logging.info("%s: starting video %d on %s", arrival.user, arrival.quality, answer['dest_ip'])
+    try:
+        exited = await launcher.run(arrival.user, player_command(arrival, answer, log_path))
+        arrival.launched = clock()
+        arrival.status = await exited
+    except (ValueError, EOFError) as e:
+        logging.error("%s: %s", arrival.user, e)
+        arrival.outcome = 'LAUNCH_FAILED'
+    arrival.exited = clock()
+    try:
+        await pool.call('POST', 'release-%d' % arrival.session)
+    except (OSError, EOFError, asyncio.IncompleteReadError) as e:
+        logging.error("%s: session %d not released: %s", arrival.user, arrival.session, e)
+
+
+async def replay(arrivals, log_path, pool, launcher, start_delay=START_DELAY):
+    """ Fires every arrival at its deadline and waits for the last player
+
+        Each deadline is awaited from the same start time, and the videos of an
+        arrival are admitted and launched in their own task, so neither a slow
+        admission nor a slow launch delays the arrivals after it.
+    """
+    loop = asyncio.get_event_loop()
+    await pool.wait_ready()
+    start = loop.time() + start_delay
+
+    def clock():
+        return loop.time() - start
+
+    tasks = []
+    for offset, group in itertools.groupby(arrivals, key=lambda arrival: arrival.offset):
+        group = list(group)
+        delay = offset - clock()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        fired = clock()
+        for arrival in group:
+            arrival.fired = fired
+        tasks.append(asyncio.ensure_future(play(group, log_path, pool, launcher, clock)))
+    await asyncio.gather(*tasks)
+    return arrivals
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100.0 * (len(values) - 1))))]
+
+
+def drift_report(arrivals):
+    """ Lateness of the arrivals against the trace, in ms: {'fired'|'launched': {mean, p50, p99, max}}
+    """
+    report = dict(videos=len(arrivals), outcomes={})
+    for arrival in arrivals:
+        outcome = str(arrival.outcome)
+        report['outcomes'][outcome] = report['outcomes'].get(outcome, 0) + 1
+    for name in ('fired', 'launched'):
+        late = [(getattr(arrival, name) - arrival.offset) * 1000.0 for arrival in arrivals
+                if getattr(arrival, name) is not None]
+        if late:
+            report[name] = dict(count=len(late), mean_ms=sum(late) / len(late), p50_ms=percentile(late, 50),
+                                p99_ms=percentile(late, 99), max_ms=max(late))
+    return report
+
+
+def run(trace_path, log_path, control_socket=host_control.CONTROL_SOCKET, host=CONTROLLER_HOST,
+        port=CONTROLLER_PORT, connections=HTTP_CONNECTIONS, json_path=None):
+    """ Replays a trace file on the headless network of control_socket, prints and returns the drift report
+    """
+    arrivals = read_trace(trace_path)
+    opened = []
+
+    async def main():
+        pool = HttpPool(host, port, connections)
+        launcher = HostLauncher()
+        await launcher.connect(control_socket)
+        try:
+            await replay(arrivals, log_path, pool, launcher)
+        finally:
+            launcher.close()
+            pool.close()
+            opened.append(pool.opened)
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+    report = drift_report(arrivals)
+    report['http_connections'] = opened[0]
+    print("videos: %d (%s), controller connections opened: %d"
+          % (report['videos'], ", ".join("%s %d" % item for item in sorted(report['outcomes'].items())),
+             report['http_connections']))
+    print("%-10s %8s %10s %10s %10s %10s" % ('late', 'count', 'mean ms', 'p50 ms', 'p99 ms', 'max ms'))
+    for name in ('fired', 'launched'):
+        if name in report:
+            late = report[name]
+            print("%-10s %8d %10.3f %10.3f %10.3f %10.3f" % (name, late['count'], late['mean_ms'], late['p50_ms'],
+                                                             late['p99_ms'], late['max_ms']))
+    if json_path:
+        with open(json_path, 'w') as out:
+            json.dump(dict(report, arrivals=[arrival.as_dict() for arrival in arrivals]), out, indent=4)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay a video trace on a headless Topo_DBR.py network')
+    parser.add_argument("trace", nargs='?', default='static_trace.csv', help="trace file, e.g. traces/dash-load.csv")
+    parser.add_argument("log", nargs='?', default='out_test.csv', help="results file of the players")
+    parser.add_argument("--control-socket", default=host_control.CONTROL_SOCKET)
+    parser.add_argument("--controller", default="%s:%d" % (CONTROLLER_HOST, CONTROLLER_PORT),
+                        help="host:port of the controller REST API")
+    parser.add_argument("--connections", type=int, default=HTTP_CONNECTIONS, help="keep-alive connections to the "
+                                                                                  "controller")
+    parser.add_argument("--json", help="also write the report and every arrival to this file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every video")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    controller_host, _, controller_port = args.controller.partition(':')
+    run(args.trace, args.log, args.control_socket, controller_host, int(controller_port or CONTROLLER_PORT),
+        args.connections, args.json)
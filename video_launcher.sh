@@ -8,6 +8,19 @@ then
     touch $LOGPATH
 fi
 bash clean_videos.sh
+
+# On a headless network (Topo_DBR.py --headless) the trace is replayed on schedule through its control socket
+CONTROL_SOCKET="/tmp/bqoe-topology.sock"
+if [ -S "$CONTROL_SOCKET" ]
+then
+    exec python3 trace_replay.py --control-socket $CONTROL_SOCKET static_trace.csv $LOGPATH
+fi
+
+# Frees the bandwidth the controller reserved for a video once its player is done
+release_video() {
+    curl -X POST http://127.0.0.1:8080/bqoepath/release-$1 > /dev/null 2> /dev/null
+}
+
 status="NO_SNAPSHOT"
 while [ "$status" = "NO_SNAPSHOT" ]
 do
@@ -42,17 +55,18 @@ do
     continue
   else
     destination_name=`cat /tmp/deploy-response-$host.json | grep dst | tr -d ' \t' | cut -d ":" -f 2 | cut -d',' -f 1 | sed s/\"//g`
+    session=`cat /tmp/deploy-response-$host.json | grep session | tr -d ' \t' | cut -d ":" -f 2 | cut -d',' -f 1`
   fi
   echo "$host: Starting video $qv on $destination."
 
   if [ $qv -eq 0 ]
   then
-      /home/mininet/mininet/util/m $host bash "player_wrapper.sh $destination $UUID $host $destination_name $LOGPATH muse 32 5" & #5 min
+      ( /home/mininet/mininet/util/m $host bash "player_wrapper.sh $destination $UUID $host $destination_name $LOGPATH muse 32 5"; release_video $session ) & #5 min
   elif [ $qv -eq 1 ]
   then
-      /home/mininet/mininet/util/m $host bash "player_wrapper.sh $destination $UUID $host $destination_name $LOGPATH ny 119 20" & #20 min
+      ( /home/mininet/mininet/util/m $host bash "player_wrapper.sh $destination $UUID $host $destination_name $LOGPATH ny 119 20"; release_video $session ) & #20 min
   else
-      /home/mininet/mininet/util/m $host bash "player_wrapper.sh $destination $UUID $host $destination_name $LOGPATH gt 241 40" & #40 min
+      ( /home/mininet/mininet/util/m $host bash "player_wrapper.sh $destination $UUID $host $destination_name $LOGPATH gt 241 40"; release_video $session ) & #40 min
   fi
   sleep $sleep_fraction
 done < static_trace.csv